@@ -1,50 +1,170 @@
 from classes.rail_network import RailNetwork
+from classes.solution import Route
+from utils.helper import best_route
+from utils.route_cache import RouteCache
 
 class DepthFirstRailNetwork(RailNetwork):
     def __init__(self, max_time_limit=None):
         super().__init__(max_time_limit)
+        self.route_cache = None
+        # Nodes expanded by the depth-first searches, reported to the instrumentation
+        self.search_nodes = 0
 
-    def depth_first_search(self, current_station, end_station, visited_stations, current_route, current_time, routes):
+    def enable_route_cache(self, maxsize=None):
         """
-        Depth-first search to find routes between two stations within the max time limit.
+        Cache the routes found by find_route_ids per (start, end, time_limit),
+        keeping at most maxsize station pairs.
         """
+        self.route_cache = RouteCache(maxsize)
+        return self.route_cache
+
+    def depth_first_search(self, current_station, end_station, visited_stations, current_route, current_time, routes, time_limit=None, times_to_end=None):
+        """
+        Depth-first search to find routes between two stations within the time limit.
+        Stations are station IDs, visited_stations is a list of booleans indexed by station ID
+        and found routes are appended to routes as tuples of station IDs.
+        With times_to_end, the shortest travel times to the end station, stations from which the
+        end station can not be reached in time are skipped. This does not change the routes found.
+        """
+        self.search_nodes += 1
 
         # Append the route if it reaches the destination
         if current_station == end_station:
-            routes.append(current_route.copy())
+            routes.append(tuple(current_route))
             return
 
         # Explore all connected stations
-        for next_station_key, connection_time in self.connection_map[current_station.name]:
-            next_station = self.stations[next_station_key]
+        for next_station, connection_time, _ in self.adjacency[current_station]:
             updated_time = current_time + connection_time
 
             # Skip if the station is already visited or exceeds the time limit
-            if next_station in visited_stations or (self.max_time_limit and updated_time > self.max_time_limit):
+            if visited_stations[next_station] or (time_limit and updated_time > time_limit):
                 continue
 
-            visited_stations.add(next_station)
+            # Skip if even the fastest route from the station arrives too late
+            if times_to_end is not None and updated_time + times_to_end[next_station] > time_limit:
+                continue
+
+            visited_stations[next_station] = True
             current_route.append(next_station)
 
             # Recursive call to continue the depth-first search
-            self.depth_first_search(next_station, end_station, visited_stations, current_route, updated_time, routes)
+            self.depth_first_search(next_station, end_station, visited_stations, current_route, updated_time, routes, time_limit, times_to_end)
 
             # Backtrack to explore other routes
-            visited_stations.remove(next_station)
+            visited_stations[next_station] = False
             current_route.pop()
 
+    def find_route_ids(self, start_station, end_station, time_limit=None):
+        """
+        Finds all routes between two station IDs within the time limit, as tuples of station IDs.
+        """
+        time_limit = time_limit if time_limit is not None else self.max_time_limit
+
+        # Cached routes are shared, callers must not change them
+        if self.route_cache is not None:
+            routes = self.route_cache.get((start_station, end_station, time_limit))
+            if routes is not None:
+                self.instrumentation.count('route_cache_hits')
+                return routes
+            self.instrumentation.count('route_cache_misses')
+
+        visited_stations = [False] * len(self.station_names)
+        visited_stations[start_station] = True
+
+        routes = []
+        times_to_end = self.shortest_times(end_station) if time_limit else None
+        search_nodes = self.search_nodes
+        with self.instrumentation.timer('depth_first_search'):
+            self.depth_first_search(start_station, end_station, visited_stations, [start_station], 0, routes, time_limit, times_to_end)
+        self.instrumentation.count('dfs_nodes', self.search_nodes - search_nodes)
+
+        if self.route_cache is not None:
+            self.route_cache.put((start_station, end_station, time_limit), routes)
+        return routes
+
+    def find_best_route_ids(self, start_station, end_station, covered=0, time_limit=None, min_gain=0):
+        """
+        Finds the route between two station IDs within the time limit that adds the most to the K-score
+        when the connections in covered, a bitmask over edge IDs, are already used. Unlike find_route_ids
+        not every route is enumerated, branches that can not beat the best route so far are cut.
+        Returns a Route, or None if no route gains more than min_gain.
+        """
+        time_limit = time_limit if time_limit is not None else self.max_time_limit
+        found = best_route(self, time_limit, len(self.station_names), covered, min_gain,
+                           start_stations=[start_station], end_station=end_station, times_to_end=self.shortest_times(end_station))
+        if found is None:
+            return None
+        return Route(found[0], found[1])
+
+    def precompute_routes(self, time_limit=None):
+        """
+        Fill the route cache with the routes between every pair of stations.
+        Runs one depth-first search per start station and sorts the routes it passes by end station,
+        in the same order find_route_ids would find them.
+        """
+        time_limit = time_limit if time_limit is not None else self.max_time_limit
+        if self.route_cache is None:
+            self.enable_route_cache()
+
+        for start_station, routes_by_end in enumerate(self.iter_routes_by_start(time_limit)):
+            for end_station, routes in enumerate(routes_by_end):
+                self.route_cache.put((start_station, end_station, time_limit), routes)
+
+    def iter_routes_by_start(self, time_limit):
+        """
+        Yields for every start station a list with the routes from it to every end station.
+        """
+        for start_station in range(len(self.station_names)):
+            routes_by_end = [[] for _ in self.station_names]
+            routes_by_end[start_station].append((start_station,))
+
+            visited_stations = [False] * len(self.station_names)
+            visited_stations[start_station] = True
+            self.collect_routes(start_station, visited_stations, [start_station], 0, routes_by_end, time_limit)
+            yield routes_by_end
+
+    def collect_routes(self, current_station, visited_stations, current_route, current_time, routes_by_end, time_limit):
+        """
+        Depth-first search that stores every route from the start station within the time limit
+        in routes_by_end, grouped by the station it ends at.
+        """
+        self.search_nodes += 1
+        for next_station, connection_time, _ in self.adjacency[current_station]:
+            updated_time = current_time + connection_time
+
+            if visited_stations[next_station] or (time_limit and updated_time > time_limit):
+                continue
+
+            visited_stations[next_station] = True
+            current_route.append(next_station)
+            routes_by_end[next_station].append(tuple(current_route))
+
+            self.collect_routes(next_station, visited_stations, current_route, updated_time, routes_by_end, time_limit)
+
+            visited_stations[next_station] = False
+            current_route.pop()
+
+    def save_route_cache(self, filepath):
+        """
+        Write the cached routes to disk.
+        """
+        self.route_cache.save(filepath, self.station_names)
+
+    def load_route_cache(self, filepath, maxsize=None):
+        """
+        Load routes written by save_route_cache into the route cache.
+        """
+        if self.route_cache is None:
+            self.enable_route_cache(maxsize)
+        self.route_cache.load(filepath, self.station_names)
+
     def find_routes(self, start_station_key, end_station_key, time_limit=None):
         """
         Finds all routes between two stations within the max time limit.
         """
         if start_station_key not in self.stations or end_station_key not in self.stations:
             raise ValueError("Sttarting station or end station not in stations.")
-        
-        time_limit = time_limit if time_limit is not None else self.max_time_limit
 
-        start_station = self.stations[start_station_key]
-        end_station = self.stations[end_station_key]
-
-        routes = []
-        self.depth_first_search(start_station, end_station, {start_station}, [start_station], 0,routes)
-        return routes 
\ No newline at end of file
+        routes = self.find_route_ids(self.station_ids[start_station_key], self.station_ids[end_station_key], time_limit)
+        return [[self.stations[self.station_names[station]] for station in route] for route in routes]
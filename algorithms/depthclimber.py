@@ -1,15 +1,17 @@
-import copy
 import random
+from array import array
 from algorithms.depth_first import DepthFirstRailNetwork
-from utils.scoring import calculate_K_score
+from classes.solution import Route, Solution
+from utils.scoring import IncrementalKScore
 
 class DepthClimberRailNetwork(DepthFirstRailNetwork):
     def __init__(self, max_time_limit):
         super().__init__(max_time_limit)
 
-    def generate_initial_trajectories(self, num_trajectories):
+    def generate_initial_trajectories(self, num_trajectories, sampling=False):
         """
         Generate a starting trajectory by generating random routes for a given time limit.
+        With sampling=True every route is drawn with sample_route_ids.
         """
         trajectories = []
         for trajectory in range(num_trajectories):
@@ -18,6 +20,12 @@ class DepthClimberRailNetwork(DepthFirstRailNetwork):
 
             end_station_key = random.choice(list(self.stations.keys()))
             end_station = self.stations[end_station_key]
+
+            if sampling:
+                route = self.sample_route_ids(self.station_ids[start_station.name], self.station_ids[end_station.name], self.max_time_limit)
+                if route is not None:
+                    trajectories.append(([self.stations[self.station_names[station]] for station in route.stations], route.time))
+                continue
             
             routes = self.find_routes(start_station.name, end_station.name, self.max_time_limit)
 
@@ -34,53 +42,144 @@ class DepthClimberRailNetwork(DepthFirstRailNetwork):
         """
         Calculate the total time for a given route
         """
-        total_time = 0
-
-        for i in range(len(route) - 1):
-            current_station = route[i].name
-            next_station = route[i + 1].name 
-
-            for next_station_check, time in self.connection_map[current_station]:
-                        if next_station_check == next_station:
-                            total_time += time
-                            break
-        return total_time
+        return self.route_time([self.station_ids[station.name] for station in route])
             
     
-    def hill_climber_depth_first(self, num_iterations, initial_trajectories):
+    def sample_route_ids(self, start_station, end_station, time_limit=None, max_attempts=100):
+        """
+        Draw a random route between two station IDs within the time limit without enumerating all routes.
+
+        Walks from the start station to a random unvisited neighbor from which the end station can
+        still be reached in time, according to the shortest travel times to the end station. A walk that
+        gets stuck is rejected and started over. Every step is chosen uniformly among the feasible
+        neighbors, so routes are drawn with the probability of their walk rather than uniformly.
+        Returns a Route, or None if no route was found within max_attempts walks.
+        """
+        time_limit = time_limit if time_limit is not None else self.max_time_limit
+        times_to_end = self.shortest_times(end_station)
+        if times_to_end[start_station] > time_limit:
+            return None
+
+        for attempt in range(max_attempts):
+            visited_stations = {start_station}
+            route = [start_station]
+            current_station = start_station
+            current_time = 0
+
+            while current_station != end_station:
+                options = [
+                    (next_station, connection_time)
+                    for next_station, connection_time, _ in self.adjacency[current_station]
+                    if next_station not in visited_stations and current_time + connection_time + times_to_end[next_station] <= time_limit
+                ]
+                if not options:
+                    break
+
+                current_station, connection_time = random.choice(options)
+                current_time += connection_time
+                visited_stations.add(current_station)
+                route.append(current_station)
+
+            if current_station == end_station:
+                self.instrumentation.count('sample_walks', attempt + 1)
+                return Route(tuple(route), current_time)
+
+        self.instrumentation.count('sample_walks', max_attempts)
+        return None
+
+    def hill_climber_depth_first(self, num_iterations, initial_trajectories, sampling=False, record_trajectories=True, sink=None, checkpoint=None):
         """
-        Hill climbing optimization using random chosen depth-first search routes
+        Hill climbing optimization using random chosen depth-first search routes.
+        With sampling=True a single route is drawn with sample_route_ids instead of choosing
+        from all routes between the two stations.
+        With record_trajectories=False the trajectory of every iteration is not kept, with a sink
+        (utils.results) the K-score and trajectory of every iteration are streamed to it.
+        With a checkpoint (utils.checkpoint) the state of the run is saved whenever a checkpoint is due,
+        and a run that was saved in the checkpoint continues from there, initial_trajectories is then not used.
         """
-        trajectory_list = []
-        current_trajectory = initial_trajectories
-        best_K_score = calculate_K_score(current_trajectory, self.connections)
-        k_score_list = [best_K_score]
-
-        for iteration in range(num_iterations):
-            new_solution = copy.deepcopy(current_trajectory)
-            index_to_replace = random.randint(0, len(new_solution) - 1)
+        instrumentation = self.instrumentation
+        with instrumentation.run('depth_climber'):
+            resume = checkpoint.resume('depth_climber') if checkpoint is not None else None
+            if resume is None:
+                current_solution = Solution.from_station_routes(initial_trajectories, self)
+            else:
+                current_solution = resume['current_solution']
+                random.setstate(resume['random'])
+
+            # The scorer only depends on the routes of the solution, so a checkpoint does not store it
+            scorer = IncrementalKScore(self.connections, current_solution)
+            best_K_score = scorer.score()
+
+            if resume is None:
+                first_iteration = 0
+                k_score_list = [best_K_score]
+                trajectory_list = []
+                if sink is not None:
+                    sink.new_run()
+                    sink.write(0, best_K_score, current_solution)
+            else:
+                first_iteration = resume['iteration']
+                k_score_list = list(resume['k_score_list'])
+                trajectory_list = resume['trajectory_list']
+            if sink is not None:
+                instrumentation.time_calls(sink, 'write', 'record')
+            instrumentation.time_calls(self, 'sample_route_ids' if sampling else 'find_route_ids', 'route')
+            instrumentation.time_calls(scorer, 'score_with', 'score')
+
+            # Routes end at random stations, so the shortest times to all of them are computed at once,
+            # shortest_times then returns rows of the matrix
+            with instrumentation.timer('shortest_times'):
+                self.shortest_time_matrix()
+
+            for iteration in range(first_iteration, num_iterations):
+                # Without initial routes, which happens on tight time limits, the new route is added instead
+                index_to_replace = random.randint(0, len(current_solution) - 1) if len(current_solution) else 0
             
-            start_station_key = random.choice(list(self.stations.keys()))
-            end_station_key = random.choice(list(self.stations.keys()))
+                start_station = random.randrange(len(self.station_names))
+                end_station = random.randrange(len(self.station_names))
             
-            possible_routes = self.find_routes(start_station_key, end_station_key, self.max_time_limit)
+                if sampling:
+                    new_route = self.sample_route_ids(start_station, end_station, self.max_time_limit)
+                else:
+                    possible_routes = self.find_route_ids(start_station, end_station, self.max_time_limit)
+                    new_route = None
+                    if possible_routes:
+                        route = random.choice(possible_routes)
+                        new_route = Route(route, self.route_time(route))
 
-            if possible_routes:
-                new_route = random.choice(possible_routes)
-                
-                time_new_route = self.calculate_route_time(new_route)
-                
-                # Update trajectory and recalculate K-score
-                new_solution[index_to_replace] = (new_route, time_new_route)
-                new_score = calculate_K_score(new_solution, self.connections)
-                trajectory_list.append([list(station.name for station in route) for route, _ in new_solution])
-                
-                k_score_list.append(new_score)
+                if new_route is None:
+                    instrumentation.count('no_route')
+                else:
+                    # Replace a single route, the other routes are shared with the current solution
+                    replacement = {index_to_replace: new_route}
+                    new_solution = current_solution.replace(replacement)
+                    new_score = scorer.score_with(replacement)
+                    if record_trajectories:
+                        trajectory_list.append(new_solution.station_names(self))
+
+                    k_score_list.append(new_score)
+                    if sink is not None:
+                        sink.write(iteration + 1, new_score, new_solution)
                 
-                # Check if new solution is better
-                if new_score > best_K_score:
-                    current_trajectory = new_solution
-                    best_K_score = new_score
-                    print(f"Iteration {iteration}: Improved K-score to {best_K_score}")
+                    # Check if new solution is better
+                    if new_score > best_K_score:
+                        scorer.replace_routes(replacement)
+                        current_solution = new_solution
+                        best_K_score = new_score
+                        instrumentation.count('accepted')
+                        instrumentation.event('improvement', iteration=iteration, K_score=best_K_score)
+                        print(f"Iteration {iteration}: Improved K-score to {best_K_score}")
+
+                if checkpoint is not None and checkpoint.due():
+                    checkpoint.save('depth_climber', {
+                        'iteration': iteration + 1,
+                        'current_solution': current_solution,
+                        'random': random.getstate(),
+                        'k_score_list': array('d', k_score_list),
+                        'trajectory_list': trajectory_list,
+                    })
 
-        return current_trajectory, best_K_score, k_score_list,trajectory_list
\ No newline at end of file
+            if checkpoint is not None:
+                checkpoint.clear('depth_climber')
+            instrumentation.count('iterations', num_iterations - first_iteration)
+        return current_solution.to_station_routes(self), best_K_score, k_score_list, trajectory_list
\ No newline at end of file
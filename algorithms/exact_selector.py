@@ -0,0 +1,180 @@
+import time
+import numpy as np
+from algorithms.greedy_selector import GreedyRouteSelector
+from utils.coverage import mask_edges, prune_dominated
+from utils.scoring import calculate_K_score
+
+class ExactRouteSelector(GreedyRouteSelector):
+    """
+    Selects the routes with the highest K-score from a set of candidate trajectories with branch-and-bound,
+    unless node_limit or time_limit stops the search before it is complete.
+
+    Every candidate is either selected or not, at most max_routes are selected, and the K-score is
+    covered connections * 10000 / connections minus 100 and the duration of every selected route.
+    The candidates are sorted once by their gain, and a node of the search only keeps the index of the
+    next candidate to decide: the candidates before it are selected or left out, those after it are free.
+
+    The upper bound on what the free candidates can still add is a Lagrangian relaxation that keeps the
+    route limit. Every uncovered connection gets a multiplier u between 0 and its value, and the bound is
+    the value minus u of every uncovered connection plus the profits of the best routes_left candidates,
+    where the profit of a candidate is the u of its uncovered connections minus its cost. The multipliers
+    are improved with subgradient steps, which brings the bound down towards that of the LP relaxation, and
+    a child starts from the multipliers of its parent.
+    """
+    def __init__(self, connections):
+        super().__init__(connections)
+
+    def prune_candidates(self, trajectories, max_time=180):
+        """
+        Returns the candidates as (path, duration, mask) tuples without dominated candidates and
+        without candidates that cost more than their connections are worth, with the amount of
+        candidates before pruning.
+        """
+        candidates = list(self.path_masks(trajectories, max_time))
+        num_candidates = len(candidates)
+
+        connection_value = 10000 / len(self.connections) if self.connections else 0
+        candidates = [candidate for candidate in candidates if candidate[2].bit_count() * connection_value - (100 + candidate[1]) > 0]
+
+        return prune_dominated(candidates, self.connections), num_candidates
+
+    def solve(self, trajectories, max_routes=20, max_time=180, node_limit=None, time_limit=None):
+        """
+        Select the best routes from the trajectories.
+        Stops early after node_limit branch-and-bound nodes or time_limit seconds.
+        Returns the selected routes and a report with the size of the candidate pool, the amount of nodes,
+        the K-score, the upper bound on the K-score, the optimality gap between both and, if the search
+        stopped early, the limit that stopped it.
+        """
+        start_time = time.perf_counter()
+        connection_value = 10000 / len(self.connections) if self.connections else 0
+        candidates, num_candidates = self.prune_candidates(trajectories, max_time)
+        candidates.sort(key=lambda candidate: candidate[2].bit_count() * connection_value - (100 + candidate[1]), reverse=True)
+
+        # One row per candidate with the connections it uses
+        matrix = np.zeros((len(candidates), len(self.connections)))
+        for position, (_, _, mask) in enumerate(candidates):
+            matrix[position, mask_edges(mask)] = 1
+        costs = np.array([100 + duration for _, duration, _ in candidates], dtype=float)
+
+        # Start from the lazy greedy selection, so branches that can not beat it are cut right away
+        best_routes = self.lazy_greedy_optimization([(path, duration) for path, duration, _ in candidates], max_routes, max_time)
+        best_value = self.selection_value(best_routes, connection_value)
+
+        # Nodes are (upper bound of the parent, multipliers of the parent, uncovered connections, value,
+        # selected candidates, index of the next candidate)
+        uncovered = np.ones(len(self.connections))
+        stack = [(float('inf'), uncovered * connection_value, uncovered, 0, (), 0)]
+        nodes = 0
+        stopped_by = None
+
+        while stack:
+            # The root is always bounded, so an early stop still reports a gap
+            if nodes > 0 and node_limit is not None and nodes >= node_limit:
+                stopped_by = "node limit"
+            elif nodes > 0 and time_limit is not None and time.perf_counter() - start_time >= time_limit:
+                stopped_by = "time limit"
+            if stopped_by is not None:
+                break
+
+            parent_bound, multipliers, uncovered, value, selected, next_position = stack.pop()
+            if parent_bound <= best_value:
+                continue
+            routes_left = max_routes - len(selected)
+            if routes_left == 0 or next_position == len(candidates):
+                continue
+            nodes += 1
+
+            # Skip to the first free candidate that still adds something
+            gains = (matrix[next_position:] @ uncovered) * connection_value - costs[next_position:]
+            adding = np.flatnonzero(gains > 0)
+            if len(adding) == 0:
+                continue
+            next_position += adding[0]
+
+            bound, multipliers = self.lagrangian_bound(matrix[next_position:], costs[next_position:], uncovered, routes_left,
+                                                       connection_value, best_value - value, multipliers,
+                                                       iterations=100 if nodes == 1 else 10)
+            bound += value
+            if bound <= best_value:
+                continue
+
+            # Branch on the next candidate: first without it, then with it so it is explored first
+            stack.append((bound, multipliers, uncovered, value, selected, next_position + 1))
+
+            new_value = value + gains[adding[0]]
+            new_selected = selected + (next_position,)
+            if new_value > best_value:
+                best_value = new_value
+                best_routes = [(candidates[selected_position][0], candidates[selected_position][1]) for selected_position in new_selected]
+            stack.append((bound, multipliers, uncovered * (1 - matrix[next_position]), new_value, new_selected, next_position + 1))
+
+        # The open nodes bound what could still be found
+        upper_value = max([best_value] + [node[0] for node in stack]) if stopped_by else best_value
+        best_K_score = calculate_K_score(best_routes, self.connections)
+        upper_bound = best_K_score + (upper_value - best_value)
+
+        report = {
+            "candidates": num_candidates,
+            "pruned_candidates": len(candidates),
+            "nodes": nodes,
+            "K_score": best_K_score,
+            "upper_bound": upper_bound,
+            "gap": upper_bound - best_K_score,
+            "optimal": stopped_by is None,
+            "stopped_by": stopped_by,
+            "seconds": time.perf_counter() - start_time,
+        }
+        return best_routes, report
+
+    def lagrangian_bound(self, matrix, costs, uncovered, routes_left, connection_value, target, multipliers, iterations):
+        """
+        Returns an upper bound on what at most routes_left of the candidates in matrix can add to the
+        uncovered connections, and the multipliers of that bound.
+        Stops as soon as the bound is at most target, the value that is needed to beat the best selection.
+        """
+        best_bound, best_multipliers = float('inf'), multipliers
+        step_size = 2.0
+        stalled = 0
+        for _ in range(iterations):
+            profits = matrix @ (multipliers * uncovered) - costs
+            chosen = np.flatnonzero(profits > 0)
+            if len(chosen) > routes_left:
+                chosen = chosen[np.argpartition(profits[chosen], -routes_left)[-routes_left:]]
+            counted = (multipliers < connection_value) * uncovered
+            bound = ((connection_value - multipliers) * counted).sum() + profits[chosen].sum()
+
+            # Smaller steps when the bound has not improved for a while
+            if bound < best_bound:
+                best_bound, best_multipliers = bound, multipliers
+                stalled = 0
+            else:
+                stalled += 1
+                if stalled == 5:
+                    step_size /= 2
+                    stalled = 0
+            if best_bound <= target:
+                break
+
+            # Lower the multipliers of connections the chosen candidates cover more than once,
+            # raise those of connections that are counted but not covered
+            subgradient = (matrix[chosen].sum(axis=0) - counted) * uncovered
+            norm = subgradient @ subgradient
+            if norm == 0:
+                break
+            step = step_size * (bound - target) / norm
+            multipliers = np.clip(multipliers - step * subgradient, 0, connection_value)
+
+        return best_bound, best_multipliers
+
+    def selection_value(self, routes, connection_value):
+        """
+        Returns the K-score of selected routes as the branch-and-bound computes it.
+        """
+        covered = 0
+        value = 0
+        for path, duration in routes:
+            mask = self.path_mask(path)
+            value += (mask & ~covered).bit_count() * connection_value - (100 + duration)
+            covered |= mask
+        return value
@@ -1,43 +1,150 @@
+import heapq
+from operator import itemgetter
+from utils.coverage import build_edge_index, path_mask
+from utils.helper import best_route
+from utils.instrumentation import NO_INSTRUMENTATION, Recorder
+
 class GreedyRouteSelector:
     def __init__(self, connections):
         self.connections = connections
+        self.edge_index = build_edge_index(connections)
+        self.instrumentation = NO_INSTRUMENTATION
+
+    def instrument(self, instrumentation=None):
+        """
+        Record timers, counters and events of the selections (utils.instrumentation).
+        Uses a new Recorder if no instrumentation is given, and returns the instrumentation.
+        """
+        self.instrumentation = instrumentation if instrumentation is not None else Recorder()
+        return self.instrumentation
+
+    def greedy_optimization(self, trajectories, max_routes=20, max_time=180, first_path_index=0, max_candidates=None):
+        """ Greedy optimisation to select routes based on maximising
+        of new connections, within a given time limit and maximum number of routes.
+
+        trajectories can be any iterable of (path, duration) tuples, such as the generator from
+        utils.helper.iter_trajectories. Only the path and its ranking are kept per candidate; with
+        max_candidates set, only the best ranked candidates are kept, which bounds memory use.
+        The connections of a path are a bitmask over edge IDs, so overlaps are bitwise ands."""
+        instrumentation = self.instrumentation
+        with instrumentation.run('greedy'):
+            selected_routes = []
+            used_connections_mask = 0
+            total_time_used = 0
+
+            # Sort paths based on greedy criteria:
+            # - First paths with the most new connections
+            # - Then paths with the fewest already used connections
+            # - Finally, the shortest paths (for efficiency)
+            # No connections are used before the selection, so every connection of a path is new.
+            path_data = (
+                (-mask.bit_count(), 0, duration, path, mask)
+                for path, duration, mask in self.path_masks(trajectories, max_time)
+            )
+            ranking = itemgetter(0, 1, 2)
+            with instrumentation.timer('rank'):
+                if max_candidates is None:
+                    path_data = sorted(path_data, key=ranking)
+                else:
+                    path_data = heapq.nsmallest(max_candidates, path_data, key=ranking)
+
+            with instrumentation.timer('select'):
+                for _, _, duration, path, mask in path_data:
+                    if len(selected_routes) >= max_routes:
+                        break
+                    if not mask & used_connections_mask:
+                        selected_routes.append((path, duration))
+                        used_connections_mask |= mask
+                        total_time_used += duration
+                        instrumentation.event('route_selected', route=len(selected_routes), connections=mask.bit_count(), duration=duration)
+
+            instrumentation.count('selected', len(selected_routes))
+        return selected_routes
+
+    def lazy_greedy_optimization(self, trajectories, max_routes=20, max_time=180):
+        """ Lazy greedy optimisation that repeatedly selects the route that adds the most to the K-score,
+        new connections * 10000 / connections minus 100 and its duration, until no route improves it.
 
-    def greedy_optimization(self, trajectories, max_routes=20, max_time=180, first_path_index=0):
-        """ Greedy optimisation to select routes based on maximising 
-        of new connections, within a given time limit and maximum number of routes."""
-        selected_routes = []
-        unique_used_connections = set()
-        total_time_used = 0
-
-        path_data = []
-        for path, duration in trajectories:
-            if duration <= max_time and duration > 0:
-                unique_connections = set(tuple(sorted((path[i], path[i + 1]))) for i in range(len(path) - 1))
-                new_connections = unique_connections - unique_used_connections
-                used_connections = unique_connections & unique_used_connections
-
-                path_data.append({
-                    "path": path,
-                    "duration": duration,
-                    "new_connections": len(new_connections),
-                    "used_connections": len(used_connections),
-                    "unique_connections": unique_connections,
-                })
-
-        # Sort paths based on greedy criteria:
-        # - First paths with the most new connections
-        # - Then paths with the fewest already used connections
-        # - Finally, the shortest paths (for efficiency)
-        path_data.sort(key=lambda x: (-x["new_connections"], x["used_connections"], x["duration"]))
-
-        for data in path_data:
-            if len(selected_routes) >= max_routes:
-                break
-            if not data["unique_connections"] & unique_used_connections:
-                selected_routes.append((data["path"], data["duration"]))
-                unique_used_connections.update(data["unique_connections"])
-                total_time_used += data["duration"]
+        The gain of a route can only decrease when more connections are used, so gains are kept in a
+        priority queue as upper bounds and only the best route is rescored after every selection."""
+        instrumentation = self.instrumentation
+        with instrumentation.run('lazy_greedy'):
+            selected_routes = []
+            used_connections_mask = 0
+            connection_value = 10000 / len(self.connections) if self.connections else 0
 
+            # Heap entries are (-gain, position, selections when the gain was computed, path, duration, mask)
+            with instrumentation.timer('rank'):
+                queue = []
+                for position, (path, duration, mask) in enumerate(self.path_masks(trajectories, max_time)):
+                    gain = mask.bit_count() * connection_value - (100 + duration)
+                    queue.append((-gain, position, 0, path, duration, mask))
+                heapq.heapify(queue)
+
+            rescored = 0
+            with instrumentation.timer('select'):
+                while queue and len(selected_routes) < max_routes:
+                    negative_gain, position, evaluated_at, path, duration, mask = heapq.heappop(queue)
+
+                    if evaluated_at == len(selected_routes):
+                        # The gain is up to date, so no other route can add more
+                        if negative_gain >= 0:
+                            break
+                        selected_routes.append((path, duration))
+                        used_connections_mask |= mask
+                        instrumentation.event('route_selected', route=len(selected_routes), gain=-negative_gain, duration=duration)
+                        continue
+
+                    # Rescore a stale gain against the connections used so far
+                    gain = (mask & ~used_connections_mask).bit_count() * connection_value - (100 + duration)
+                    heapq.heappush(queue, (-gain, position, len(selected_routes), path, duration, mask))
+                    rescored += 1
+
+            instrumentation.count('rescored', rescored)
+            instrumentation.count('selected', len(selected_routes))
         return selected_routes
-    
 
+    def bounded_greedy_optimization(self, network, max_routes=20, max_time=180, max_stations=100):
+        """ Greedy optimisation with the same rule as lazy_greedy_optimization, but without a pool of trajectories:
+        every route is generated with the branch-and-bound search of utils.helper.best_route against the
+        connections used so far, so only routes that can still beat the best route found are explored.
+        Returns the routes as (path, duration) tuples with paths of station names."""
+        instrumentation = self.instrumentation
+        with instrumentation.run('bounded_greedy'):
+            selected_routes = []
+            used_connections_mask = 0
+
+            with instrumentation.timer('select'):
+                while len(selected_routes) < max_routes:
+                    found = best_route(network, max_time, max_stations, used_connections_mask)
+                    if found is None:
+                        break
+                    route, duration, mask, gain = found
+                    selected_routes.append((tuple(network.station_names[station] for station in route), duration))
+                    used_connections_mask |= mask
+                    instrumentation.event('route_selected', route=len(selected_routes), gain=gain, duration=duration)
+
+            instrumentation.count('selected', len(selected_routes))
+        return selected_routes
+
+    def path_mask(self, path):
+        """ Returns the connections of a path as a bitmask over edge IDs."""
+        return path_mask(path, self.edge_index)
+
+    def path_masks(self, trajectories, max_time):
+        """
+        Yields (path, duration, mask) for every trajectory with a duration within max_time.
+        Pools that store their masks (utils.cache.TrajectoryPool) are read without recomputing them.
+        """
+        candidates = 0
+        if hasattr(trajectories, 'iter_masks'):
+            for path, duration, mask in trajectories.iter_masks():
+                if duration <= max_time and duration > 0:
+                    candidates += 1
+                    yield path, duration, mask
+        else:
+            for path, duration in trajectories:
+                if duration <= max_time and duration > 0:
+                    candidates += 1
+                    yield path, duration, self.path_mask(path)
+        self.instrumentation.count('candidates', candidates)
@@ -1,93 +1,165 @@
-import copy
 import random
+from array import array
 from classes.rail_network import RailNetwork
-from utils.scoring import calculate_K_score
+from classes.solution import Route, Solution
+from utils.scoring import IncrementalKScore
+from utils.budget import SearchBudget
 
 class HillClimberRailNetwork(RailNetwork):
     def __init__(self, max_time_limit):
         super().__init__(max_time_limit)
 
-    def generate_random_route(self, start_station):
+    def random_route(self, start_station):
         """
-        Generate a random route starting from a station within the time limit.
+        Generate a random route as a Route of station IDs, starting from a station ID within the time limit.
         """
-        current_station = self.stations[start_station]
+        current_station = start_station
         route = [current_station]
         time_route = 0
 
         max_connections = random.randint(2, 50)
 
         for connection_n in range(max_connections):
-            connections = self.connection_map[current_station.name]
-            
+            connections = self.adjacency[current_station]
+
             if not connections:
                 break
 
-            next_station_key, time = random.choice(connections)
-            next_station = self.stations[next_station_key]
+            next_station, time, _ = random.choice(connections)
 
             if time_route + time > self.max_time_limit:
                 break
-            
+
             time_route += time
             route.append(next_station)
             current_station = next_station
 
-        return route, time_route
+        return Route(tuple(route), time_route)
+
+    def generate_random_route(self, start_station):
+        """
+        Generate a random route starting from a station within the time limit.
+        """
+        route, time_route = self.random_route(self.station_ids[start_station])
+        return [self.stations[self.station_names[station]] for station in route], time_route
+
+    def random_solution(self, num_routes):
+        """
+        Generate a Solution of a given amount of random routes.
+        """
+        return Solution(self.random_route(random.randrange(len(self.station_names))) for route_n in range(num_routes))
 
     def generate_random_trajectory(self, num_routes):
         """
         Generate a random set of a random amount of routes.
         """
-        routes = []
+        return self.random_solution(num_routes).to_station_routes(self)
 
-        for route_n in range(num_routes):
-            start_station = random.choice(list(self.stations.keys()))
-            route, total_time = self.generate_random_route(start_station)
-            routes.append((route, total_time))
-
-        return routes
-    
-    def swap_routes(self, trajectories):
+    def propose_swap(self, solution):
         """
-        Change a random amount of routes in a list of trajectories.
+        Choose a random amount of routes to change in a solution.
+        Returns a dict that maps the indices of the routes to replace to new routes.
         """
-        trajectories_copy = copy.deepcopy(trajectories)
-        
+        replacements = {}
+
         # Randomly select num routes to replace but limit to half of the total routes
-        num_replace = random.randint(1, len(trajectories_copy) // 2)
-        
+        num_replace = random.randint(1, max(1, len(solution) // 2))
+
         for _ in range(num_replace):
-            index_to_replace = random.randint(0, len(trajectories_copy) - 1)
+            index_to_replace = random.randint(0, len(solution) - 1)
+            replacements[index_to_replace] = self.random_route(random.randrange(len(self.station_names)))
 
-            start_station = random.choice(list(self.stations.keys()))
-            new_route, new_time = self.generate_random_route(start_station)
+        return replacements
 
-            trajectories_copy[index_to_replace] = (new_route, new_time)
+    def swap_routes(self, solution):
+        """
+        Change a random amount of routes in a solution.
+        Only the replaced routes are new, the other routes are shared with the given solution.
+        """
+        return solution.replace(self.propose_swap(solution))
 
-        return trajectories_copy
-    
-    def hill_climber_optimization(self, num_iterations, num_routes=10):
+    def hill_climber_optimization(self, num_iterations, num_routes=10, record_trajectories=True, verbose=True, time_budget=None, sink=None, moves=None, checkpoint=None):
         """
         Hill climber optimization algorithm to find the best set of trajectories.
+        With record_trajectories=False the trajectory of every iteration is not kept,
+        with verbose=False improvements are not printed. With time_budget set the run also
+        stops after that many CPU seconds, num_iterations can then be None.
+        With a sink (utils.results) the K-score and trajectory of every iteration are streamed to it.
+        With moves (algorithms.moves.RouteMoves) routes are also extended, trimmed, rerouted, merged,
+        split and deleted instead of only replaced, so the amount of routes can change during the run.
+        With a checkpoint (utils.checkpoint) the state of the run is saved whenever a checkpoint is due,
+        and a run that was saved in the checkpoint continues from there with the same random numbers.
         """
-        trajectory_list = []
-        best_routes = self.generate_random_trajectory(num_routes)
-        best_K_score = calculate_K_score(best_routes, self.connections)
-        k_score_list = [best_K_score]
-
-        for iteration in range(num_iterations):
-            updated_trajectory = self.swap_routes(best_routes)
-            updated_K_score = calculate_K_score(updated_trajectory, self.connections)
-
-            trajectory_list.append([list(station.name for station in route) for route, _ in updated_trajectory])
-
-            k_score_list.append(updated_K_score)
-
-            if updated_K_score > best_K_score:
-                best_routes = updated_trajectory
-                best_K_score = updated_K_score
-
-                print(f"Iteration: {iteration}, K-Score: {best_K_score}")
-
-        return best_routes, best_K_score, k_score_list, trajectory_list
\ No newline at end of file
+        instrumentation = self.instrumentation
+        with instrumentation.run('hill_climber'):
+            resume = checkpoint.resume('hill_climber') if checkpoint is not None else None
+            if resume is None:
+                best_solution = self.random_solution(num_routes)
+            else:
+                best_solution = resume['best_solution']
+                random.setstate(resume['random'])
+
+            budget = SearchBudget(num_iterations, time_budget, resume['elapsed'] if resume is not None else 0)
+            # The scorer only depends on the routes of the solution, so a checkpoint does not store it
+            scorer = IncrementalKScore(self.connections, best_solution)
+            best_K_score = scorer.score()
+
+            if resume is None:
+                iteration = 0
+                k_score_list = [best_K_score]
+                trajectory_list = []
+                if sink is not None:
+                    sink.new_run()
+                    sink.write(0, best_K_score, best_solution)
+            else:
+                iteration = resume['iteration']
+                k_score_list = list(resume['k_score_list'])
+                trajectory_list = resume['trajectory_list']
+            if sink is not None:
+                instrumentation.time_calls(sink, 'write', 'record')
+            if moves is None:
+                instrumentation.time_calls(self, 'propose_swap', 'propose')
+                propose = self.propose_swap
+            else:
+                instrumentation.time_calls(moves, 'propose', 'propose')
+                propose = moves.propose
+            instrumentation.time_calls(scorer, 'score_with', 'score')
+
+            while not budget.exhausted(iteration):
+                replacements = propose(best_solution)
+                updated_K_score = scorer.score_with(replacements)
+                updated_solution = best_solution.replace(replacements)
+
+                if record_trajectories:
+                    trajectory_list.append(updated_solution.station_names(self))
+
+                k_score_list.append(updated_K_score)
+                if sink is not None:
+                    sink.write(iteration + 1, updated_K_score, updated_solution)
+
+                if updated_K_score > best_K_score:
+                    scorer.replace_routes(replacements)
+                    best_solution = updated_solution
+                    best_K_score = updated_K_score
+                    instrumentation.count('accepted')
+                    instrumentation.event('improvement', iteration=iteration, K_score=best_K_score)
+
+                    if verbose:
+                        print(f"Iteration: {iteration}, K-Score: {best_K_score}")
+
+                iteration += 1
+
+                if checkpoint is not None and checkpoint.due():
+                    checkpoint.save('hill_climber', {
+                        'iteration': iteration,
+                        'best_solution': best_solution,
+                        'random': random.getstate(),
+                        'k_score_list': array('d', k_score_list),
+                        'trajectory_list': trajectory_list,
+                        'elapsed': budget.elapsed(),
+                    })
+
+            if checkpoint is not None:
+                checkpoint.clear('hill_climber')
+            instrumentation.count('iterations', iteration)
+        return best_solution.to_station_routes(self), best_K_score, k_score_list, trajectory_list
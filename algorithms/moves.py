@@ -0,0 +1,210 @@
+import random
+from classes.solution import Route
+
+# How often every move is chosen relative to the others
+DEFAULT_MOVE_WEIGHTS = {
+    'extend': 4,
+    'trim': 2,
+    'reroute': 2,
+    'merge': 1,
+    'delete': 1,
+    'split': 0.5,
+    'replace': 1,
+}
+
+class RouteMoves:
+    """
+    Small changes to the routes of a Solution, for the hill climber, simulated annealing and tabu search.
+
+    Instead of only replacing whole routes by new random routes, a move extends or trims a route by
+    one connection, reroutes a few connections in the middle of a route, merges two routes that meet,
+    deletes a route, splits a route in two or replaces routes like propose_swap. Good parts of a
+    solution are kept, so far fewer proposals are worse than the current solution.
+
+    Every move returns replacements in the format of Solution.replace and IncrementalKScore.score_with:
+    a dict from route indices to new routes, with None for a removed route and indices from len(solution)
+    on for added routes. Building a move costs the length of the routes involved, and so does scoring it.
+    A move returns None when it is not possible for the routes it picked, propose then tries another one.
+    """
+    def __init__(self, network, weights=None, max_routes=None, max_detour=4, max_attempts=20):
+        self.network = network
+        self.time_limit = network.max_time_limit
+        self.max_routes = max_routes
+        self.max_detour = max_detour
+        self.max_attempts = max_attempts
+
+        weights = {**DEFAULT_MOVE_WEIGHTS, **(weights or {})}
+        self.move_names = [name for name, weight in weights.items() if weight > 0]
+        self.move_weights = [weights[name] for name in self.move_names]
+        self.moves = [getattr(self, name) for name in self.move_names]
+
+    def propose(self, solution):
+        """
+        Returns the replacements of a random possible move.
+        """
+        for _ in range(self.max_attempts):
+            move = random.choices(self.moves, self.move_weights)[0]
+            replacements = move(solution)
+            if replacements:
+                return replacements
+
+        # Replacing routes is always possible
+        return self.network.propose_swap(solution)
+
+    def connection_time(self, station1, station2):
+        """
+        Returns the minutes of the connection between two station IDs.
+        """
+        return self.network.connection_times[station1, station2]
+
+    def path_time(self, stations):
+        """
+        Returns the total minutes of a path of station IDs.
+        """
+        return self.network.route_time(stations)
+
+    def extend(self, solution):
+        """
+        Add a random connection to the start or the end of a route.
+        """
+        index = random.randrange(len(solution))
+        stations, time = solution[index]
+        at_start = random.random() < 0.5
+        connections = self.network.adjacency[stations[0] if at_start else stations[-1]]
+        if not connections:
+            return None
+
+        next_station, distance, _ = random.choice(connections)
+        if time + distance > self.time_limit:
+            return None
+
+        if at_start:
+            return {index: Route((next_station,) + stations, time + distance)}
+        return {index: Route(stations + (next_station,), time + distance)}
+
+    def trim(self, solution):
+        """
+        Remove the first or the last connection of a route that has more than one connection.
+        """
+        index = random.randrange(len(solution))
+        stations, time = solution[index]
+        if len(stations) < 3:
+            return None
+
+        if random.random() < 0.5:
+            return {index: Route(stations[1:], time - self.connection_time(stations[0], stations[1]))}
+        return {index: Route(stations[:-1], time - self.connection_time(stations[-2], stations[-1]))}
+
+    def delete(self, solution):
+        """
+        Remove a route, if it is not the only one.
+        """
+        if len(solution) < 2:
+            return None
+        return {random.randrange(len(solution)): None}
+
+    def split(self, solution):
+        """
+        Split a route in two at one of its stations.
+        """
+        if self.max_routes is not None and len(solution) >= self.max_routes:
+            return None
+
+        index = random.randrange(len(solution))
+        stations, time = solution[index]
+        if len(stations) < 3:
+            return None
+
+        station = random.randint(1, len(stations) - 2)
+        first_time = self.path_time(stations[:station + 1])
+        return {
+            index: Route(stations[:station + 1], first_time),
+            len(solution): Route(stations[station:], time - first_time),
+        }
+
+    def merge(self, solution):
+        """
+        Join a route with another route that starts or ends at the same station as one of its ends,
+        or at a neighbouring station, into a single route.
+        """
+        if len(solution) < 2:
+            return None
+
+        index = random.randrange(len(solution))
+        stations, time = solution[index]
+
+        # Both driving directions of the route are tried, so only its last station has to meet the other route
+        options = []
+        for route_stations in (stations, stations[::-1]):
+            end = route_stations[-1]
+            neighbours = {neighbour: distance for neighbour, distance, _ in self.network.adjacency[end]}
+
+            for other_index, (other_stations, other_time) in enumerate(solution):
+                if other_index == index:
+                    continue
+                for other in (other_stations, other_stations[::-1]):
+                    if other[0] == end:
+                        merged, merged_time = route_stations + other[1:], time + other_time
+                    elif other[0] in neighbours:
+                        merged, merged_time = route_stations + other, time + other_time + neighbours[other[0]]
+                    else:
+                        continue
+                    if merged_time <= self.time_limit:
+                        options.append((other_index, merged, merged_time))
+
+        if not options:
+            return None
+        other_index, merged, merged_time = random.choice(options)
+        return {index: Route(merged, merged_time), other_index: None}
+
+    def reroute(self, solution):
+        """
+        Replace a few connections in the middle of a route by another path between the same stations.
+        """
+        index = random.randrange(len(solution))
+        stations, time = solution[index]
+        if len(stations) < 2:
+            return None
+
+        start = random.randrange(len(stations) - 1)
+        end = random.randint(start + 1, min(len(stations) - 1, start + self.max_detour))
+        segment = stations[start:end + 1]
+        segment_time = self.path_time(segment)
+
+        detour = self.random_path(segment[0], segment[-1], self.time_limit - time + segment_time, exclude=segment)
+        if detour is None:
+            return None
+
+        path, path_time = detour
+        new_time = time - segment_time + path_time
+        return {index: Route(stations[:start] + path + stations[end + 1:], new_time)}
+
+    def random_path(self, start_station, end_station, max_time, exclude=None):
+        """
+        Returns a random path of at most max_detour connections from start_station to end_station
+        within max_time minutes, other than exclude, as a tuple of station IDs and its minutes.
+        Returns None if there is no such path.
+        """
+        # Depth-first search with the neighbours in random order, stopping at the first path found
+        stack = [((start_station,), 0)]
+        while stack:
+            path, path_time = stack.pop()
+            if path[-1] == end_station and len(path) > 1:
+                if path != exclude:
+                    return path, path_time
+                continue
+            if len(path) > self.max_detour:
+                continue
+
+            connections = list(self.network.adjacency[path[-1]])
+            random.shuffle(connections)
+            for neighbour, distance, _ in connections:
+                if path_time + distance <= max_time:
+                    stack.append((path + (neighbour,), path_time + distance))
+        return None
+
+    def replace(self, solution):
+        """
+        Replace a random amount of routes by new random routes, like the hill climber.
+        """
+        return self.network.propose_swap(solution)
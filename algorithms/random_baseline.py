@@ -1,19 +1,55 @@
 import random
+import numpy as np
 from classes.rail_network import RailNetwork
-from utils.scoring import calculate_K_score
+from classes.solution import Route
 import csv
 
+MAX_ROUTES = 20
+MAX_CONNECTIONS_ROUTE = 20
+
+class BaselineBatch:
+    """
+    A batch of random trajectories stored as integer arrays, together with their K-scores.
+
+    The routes of trajectory i are rows route_offsets[i] to route_offsets[i + 1] of route_stations,
+    which holds station IDs padded with -1, with route_lengths stations and route_times minutes.
+    """
+    def __init__(self, scores, route_offsets, route_stations, route_lengths, route_times):
+        self.scores = scores
+        self.route_offsets = route_offsets
+        self.route_stations = route_stations
+        self.route_lengths = route_lengths
+        self.route_times = route_times
+
+    def __len__(self):
+        return len(self.scores)
+
+    def trajectory(self, index):
+        """
+        Returns trajectory index as a list of Routes of station IDs.
+        """
+        return [
+            Route(tuple(self.route_stations[route, :self.route_lengths[route]].tolist()), int(self.route_times[route]))
+            for route in range(self.route_offsets[index], self.route_offsets[index + 1])
+        ]
+
+    def trajectory_names(self, index, network):
+        """
+        Returns the station names of every route of trajectory index.
+        """
+        return [[network.station_names[station] for station in route] for route, _ in self.trajectory(index)]
+
 class Baseline(RailNetwork):
     def __init__(self, max_time_limit=None):
         super().__init__(max_time_limit)
-      
+
     def generate_random_route(self, start_station, time_limit):
         """
         Generate a random route by choosing random valid connection for a given start station and time limit.
         Returns the route and the total time as a tuple.
         """
 
-        num_connections_route = random.randint(1, 20)
+        num_connections_route = random.randint(1, MAX_CONNECTIONS_ROUTE)
         current_station = self.stations[start_station]
         route = [current_station]
         time_route = 0
@@ -29,7 +65,7 @@ class Baseline(RailNetwork):
 
             if time_route + time > time_limit:
                 break
-            
+
             time_route += time
             route.append(next_station)
             current_station = next_station
@@ -42,7 +78,7 @@ class Baseline(RailNetwork):
         Generate a random trajectory by generating random routes for a given time limit.
         Returns a list of routes and the total time as a tuple.
         """
-        num_routes = random.randint(1, 20)
+        num_routes = random.randint(1, MAX_ROUTES)
         routes = []
 
         for _ in range(num_routes):
@@ -52,12 +88,103 @@ class Baseline(RailNetwork):
 
         return routes
 
-    def calculate_kscore_trajectories(self, time_limit, num_trajectories):
+    def generate_random_batch(self, time_limit, num_trajectories, rng):
+        """
+        Generate and score num_trajectories random trajectories at once, drawn in the same way as
+        generate_random_trajectory, using the NumPy random generator rng.
+        Returns a BaselineBatch with the K-scores and the trajectories that produced them.
+        """
+        instrumentation = self.instrumentation
+        with instrumentation.run('random_baseline'):
+            network = self.compile()
+
+            # Draw the amount of routes per trajectory and the start and length of every route
+            num_routes = rng.integers(1, MAX_ROUTES + 1, size=num_trajectories)
+            route_offsets = np.zeros(num_trajectories + 1, dtype=np.int64)
+            np.cumsum(num_routes, out=route_offsets[1:])
+            total_routes = int(route_offsets[-1])
+            route_trajectory = np.repeat(np.arange(num_trajectories), num_routes)
+
+            current_stations = rng.integers(0, network.num_stations, size=total_routes)
+            num_connections = rng.integers(1, MAX_CONNECTIONS_ROUTE + 1, size=total_routes)
+            degrees = network.degrees
+
+            route_stations = np.full((total_routes, MAX_CONNECTIONS_ROUTE + 1), -1, dtype=np.int32)
+            # Connections used per route as a bitset over the edge IDs
+            route_masks = np.zeros((total_routes, (network.num_edges + 63) // 64), dtype=np.uint64)
+            route_stations[:, 0] = current_stations
+            route_lengths = np.ones(total_routes, dtype=np.int64)
+            route_times = np.zeros(total_routes, dtype=np.int64)
+            active = np.ones(total_routes, dtype=bool)
+
+            with instrumentation.timer('walk'):
+                # Take one step of every route that is still growing at a time
+                for step in range(MAX_CONNECTIONS_ROUTE):
+                    active &= (num_connections > step) & (degrees[current_stations] > 0)
+                    walking = np.flatnonzero(active)
+                    if len(walking) == 0:
+                        break
+
+                    stations = current_stations[walking]
+                    choice = network.offsets[stations] + (rng.random(len(walking)) * degrees[stations]).astype(np.int64)
+                    times = route_times[walking] + network.weights[choice]
+
+                    # Routes that would exceed the time limit stop before this connection
+                    in_time = times <= time_limit
+                    active[walking[~in_time]] = False
+                    walking, choice, times = walking[in_time], choice[in_time], times[in_time]
+
+                    route_times[walking] = times
+                    current_stations[walking] = network.neighbors[choice]
+                    route_stations[walking, step + 1] = network.neighbors[choice]
+                    edges = network.edge_ids[choice]
+                    route_masks[walking, edges // 64] |= np.left_shift(np.uint64(1), (edges % 64).astype(np.uint64))
+                    route_lengths[walking] += 1
+
+            # Count the unique connections per trajectory by combining the bitsets of its routes
+            with instrumentation.timer('score'):
+                trajectory_masks = np.bitwise_or.reduceat(route_masks, route_offsets[:-1], axis=0)
+                used_connections = np.bitwise_count(trajectory_masks).sum(axis=1)
+
+                total_times = np.bincount(route_trajectory, weights=route_times, minlength=num_trajectories)
+                p = used_connections / network.num_edges if network.num_edges > 0 else np.zeros(num_trajectories)
+                scores = p * 10000 - (num_routes * 100 + total_times)
+
+            instrumentation.count('iterations', num_trajectories)
+            instrumentation.count('routes', total_routes)
+        return BaselineBatch(scores, route_offsets, route_stations, route_lengths, route_times)
+
+    def iter_random_batches(self, time_limit, num_trajectories, batch_size=10000, seed=None, checkpoint=None):
+        """
+        Generate and score num_trajectories random trajectories in batches of at most batch_size.
+        Yields BaselineBatch objects.
+        With a checkpoint (utils.checkpoint) the position and random state are saved after a batch is
+        processed whenever a checkpoint is due, and batches continue after the saved position.
+        """
+        rng = np.random.default_rng(seed)
+        first = 0
+        resume = checkpoint.resume('random_baseline') if checkpoint is not None else None
+        if resume is not None:
+            first = resume['start']
+            rng.bit_generator.state = resume['random']
+
+        for start in range(first, num_trajectories, batch_size):
+            yield self.generate_random_batch(time_limit, min(batch_size, num_trajectories - start), rng)
+
+            # The caller has processed the batch when the next one is asked for
+            if checkpoint is not None and checkpoint.due():
+                checkpoint.save('random_baseline', {'start': start + batch_size, 'random': rng.bit_generator.state})
+
+        if checkpoint is not None:
+            checkpoint.clear('random_baseline')
+
+    def calculate_kscore_trajectories(self, time_limit, num_trajectories, seed=None):
         """
         Generate and evaluate K-scores of N random trajectories.
         Returns a list of K-scores.
         """
-        K_scores = [calculate_K_score(self.generate_random_trajectory(time_limit), self.connections) for _ in range(num_trajectories)]
-
+        K_scores = []
+        for batch in self.iter_random_batches(time_limit, num_trajectories, seed=seed):
+            K_scores.extend(batch.scores.tolist())
 
-        return K_scores
\ No newline at end of file
+        return K_scores
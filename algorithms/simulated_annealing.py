@@ -0,0 +1,85 @@
+import math
+import random
+from algorithms.hillclimbrandom import HillClimberRailNetwork
+from utils.scoring import IncrementalKScore
+from utils.budget import SearchBudget
+
+class SimulatedAnnealingRailNetwork(HillClimberRailNetwork):
+    """
+    Simulated annealing with the route replacement moves of the hill climber.
+    Worse solutions are accepted with probability exp(delta / temperature), where the temperature
+    drops from start_temperature to end_temperature over the iteration or time budget.
+    """
+    schedules = ('exponential', 'linear', 'logarithmic')
+
+    def __init__(self, max_time_limit):
+        super().__init__(max_time_limit)
+
+    def temperature(self, progress, start_temperature, end_temperature, schedule='exponential'):
+        """
+        Returns the temperature after a fraction progress of the budget for a cooling schedule.
+        """
+        if schedule == 'exponential':
+            return start_temperature * (end_temperature / start_temperature) ** progress
+        if schedule == 'linear':
+            return start_temperature + (end_temperature - start_temperature) * progress
+        if schedule == 'logarithmic':
+            # Fast cooling at the start that slows down, reaching end_temperature at the end of the budget
+            return start_temperature / (1 + (start_temperature / end_temperature - 1) * math.log(1 + progress * (math.e - 1)))
+        raise ValueError(f"Unknown cooling schedule {schedule}, choose from {self.schedules}.")
+
+    def simulated_annealing(self, num_iterations, num_routes=10, start_temperature=100, end_temperature=1, schedule='exponential',
+                            record_trajectories=True, verbose=True, time_budget=None, sink=None, moves=None):
+        """
+        Simulated annealing to find the best set of trajectories.
+        Stops after num_iterations iterations or time_budget CPU seconds, whichever comes first.
+        Returns the best routes, the best K-score, the K-score of the current solution at every
+        iteration and, with record_trajectories, the proposed trajectory of every iteration.
+        With a sink (utils.results) the current K-score and trajectory of every iteration are streamed to it.
+        With moves (algorithms.moves.RouteMoves) its moves are proposed instead of route replacements.
+        Raises ValueError unless 0 < end_temperature <= start_temperature, the schedules divide by both.
+        """
+        if not 0 < end_temperature <= start_temperature:
+            raise ValueError(f"The temperatures need 0 < end_temperature <= start_temperature, got {start_temperature} and {end_temperature}.")
+        if schedule not in self.schedules:
+            raise ValueError(f"Unknown cooling schedule {schedule}, choose from {self.schedules}.")
+
+        budget = SearchBudget(num_iterations, time_budget)
+        trajectory_list = []
+        current_solution = self.random_solution(num_routes)
+        scorer = IncrementalKScore(self.connections, current_solution)
+        current_K_score = scorer.score()
+        best_solution, best_K_score = current_solution, current_K_score
+        k_score_list = [current_K_score]
+        if sink is not None:
+            sink.new_run()
+            sink.write(0, current_K_score, current_solution)
+        propose = self.propose_swap if moves is None else moves.propose
+
+        iteration = 0
+        while not budget.exhausted(iteration):
+            temperature = self.temperature(budget.progress(iteration), start_temperature, end_temperature, schedule)
+
+            replacements = propose(current_solution)
+            updated_K_score = scorer.score_with(replacements)
+
+            if record_trajectories:
+                trajectory_list.append(current_solution.replace(replacements).station_names(self))
+
+            delta = updated_K_score - current_K_score
+            if delta >= 0 or random.random() < math.exp(delta / temperature):
+                scorer.replace_routes(replacements)
+                current_solution = current_solution.replace(replacements)
+                current_K_score = updated_K_score
+
+                if current_K_score > best_K_score:
+                    best_solution, best_K_score = current_solution, current_K_score
+                    if verbose:
+                        print(f"Iteration: {iteration}, Temperature: {temperature:.2f}, K-Score: {best_K_score}")
+
+            k_score_list.append(current_K_score)
+            if sink is not None:
+                sink.write(iteration + 1, current_K_score, current_solution)
+            iteration += 1
+
+        return best_solution.to_station_routes(self), best_K_score, k_score_list, trajectory_list
@@ -0,0 +1,94 @@
+from collections import deque
+from algorithms.hillclimbrandom import HillClimberRailNetwork
+from utils.scoring import IncrementalKScore
+from utils.budget import SearchBudget
+
+class TabuSearchRailNetwork(HillClimberRailNetwork):
+    """
+    Tabu search with the route replacement moves of the hill climber.
+    Every iteration evaluates a number of random replacements and moves to the best one, also when
+    it is worse. Routes that were removed recently are tabu and can not come back, unless that
+    would give a better K-score than the best found so far.
+    """
+    def __init__(self, max_time_limit):
+        super().__init__(max_time_limit)
+
+    def route_signature(self, route):
+        """
+        Returns the stations of a route in the same order for both driving directions.
+        """
+        return min(route.stations, route.stations[::-1])
+
+    def tabu_search(self, num_iterations, num_routes=10, num_neighbours=20, tabu_tenure=50,
+                    record_trajectories=True, verbose=True, time_budget=None, sink=None, moves=None):
+        """
+        Tabu search to find the best set of trajectories.
+        Stops after num_iterations iterations or time_budget CPU seconds, whichever comes first.
+        Returns the best routes, the best K-score, the K-score of the current solution at every
+        iteration and, with record_trajectories, the trajectory moved to at every iteration.
+        With a sink (utils.results) the current K-score and trajectory of every iteration are streamed to it.
+        With moves (algorithms.moves.RouteMoves) its moves are the neighbours instead of route replacements.
+        """
+        budget = SearchBudget(num_iterations, time_budget)
+        trajectory_list = []
+        current_solution = self.random_solution(num_routes)
+        scorer = IncrementalKScore(self.connections, current_solution)
+        current_K_score = scorer.score()
+        best_solution, best_K_score = current_solution, current_K_score
+        k_score_list = [current_K_score]
+        if sink is not None:
+            sink.new_run()
+            sink.write(0, current_K_score, current_solution)
+
+        # Removed routes stay tabu for tabu_tenure iterations, tabu_routes maps them to the iteration they were removed
+        tabu_queue = deque()
+        tabu_routes = {}
+        propose = self.propose_swap if moves is None else moves.propose
+
+        iteration = 0
+        while not budget.exhausted(iteration):
+            best_move, best_move_K_score = None, None
+
+            for neighbour in range(num_neighbours):
+                replacements = propose(current_solution)
+                K_score = scorer.score_with(replacements)
+
+                is_tabu = any(self.route_signature(route) in tabu_routes for route in replacements.values() if route is not None)
+                if is_tabu and K_score <= best_K_score:
+                    continue
+
+                if best_move is None or K_score > best_move_K_score:
+                    best_move, best_move_K_score = replacements, K_score
+
+            if best_move is not None:
+                # Added routes have no route they replace
+                for index in best_move:
+                    if index >= len(current_solution):
+                        continue
+                    signature = self.route_signature(current_solution[index])
+                    tabu_queue.append((iteration, signature))
+                    tabu_routes[signature] = iteration
+
+                scorer.replace_routes(best_move)
+                current_solution = current_solution.replace(best_move)
+                current_K_score = best_move_K_score
+
+                if record_trajectories:
+                    trajectory_list.append(current_solution.station_names(self))
+
+                if current_K_score > best_K_score:
+                    best_solution, best_K_score = current_solution, current_K_score
+                    if verbose:
+                        print(f"Iteration: {iteration}, K-Score: {best_K_score}")
+
+            while tabu_queue and tabu_queue[0][0] <= iteration - tabu_tenure:
+                removed_at, signature = tabu_queue.popleft()
+                if tabu_routes.get(signature) == removed_at:
+                    del tabu_routes[signature]
+
+            k_score_list.append(current_K_score)
+            if sink is not None:
+                sink.write(iteration + 1, current_K_score, current_solution)
+            iteration += 1
+
+        return best_solution.to_station_routes(self), best_K_score, k_score_list, trajectory_list
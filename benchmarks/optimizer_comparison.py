@@ -0,0 +1,56 @@
+"""
+Compares the K-score the optimizers reach within the same CPU time budget on the national network.
+
+Run from the repository root:
+    python -m benchmarks.optimizer_comparison [--time-budget 5] [--seeds 3] [--routes 12]
+"""
+import argparse
+import random
+from algorithms.hillclimbrandom import HillClimberRailNetwork
+from algorithms.simulated_annealing import SimulatedAnnealingRailNetwork
+from algorithms.tabu_search import TabuSearchRailNetwork
+
+
+def load_network(network_class, time_limit=180):
+    network = network_class(time_limit)
+    network.load_stations("data/NL/StationsNationaal.csv")
+    network.load_connections("data/NL/ConnectiesNationaal.csv")
+    return network
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare optimizers per CPU second.")
+    parser.add_argument("--time-budget", type=float, default=5, help="CPU seconds per run")
+    parser.add_argument("--seeds", type=int, default=3, help="runs per optimizer")
+    parser.add_argument("--routes", type=int, default=12, help="amount of routes per solution")
+    args = parser.parse_args()
+
+    hill_climber = load_network(HillClimberRailNetwork)
+    annealing = load_network(SimulatedAnnealingRailNetwork)
+    tabu = load_network(TabuSearchRailNetwork)
+
+    optimizers = {
+        "hill climber": lambda: hill_climber.hill_climber_optimization(None, args.routes, record_trajectories=False, verbose=False, time_budget=args.time_budget),
+        "tabu search": lambda: tabu.tabu_search(None, args.routes, record_trajectories=False, verbose=False, time_budget=args.time_budget),
+    }
+    for schedule in SimulatedAnnealingRailNetwork.schedules:
+        optimizers[f"annealing ({schedule})"] = lambda schedule=schedule: annealing.simulated_annealing(
+            None, args.routes, schedule=schedule, record_trajectories=False, verbose=False, time_budget=args.time_budget
+        )
+
+    print(f"{'optimizer':<28}{'mean K':>10}{'best K':>10}{'iterations/s':>14}")
+    for name, optimize in optimizers.items():
+        scores = []
+        iterations = 0
+        for seed in range(args.seeds):
+            random.seed(seed)
+            _, best_K_score, k_score_list, _ = optimize()
+            scores.append(best_K_score)
+            iterations += len(k_score_list) - 1
+
+        rate = iterations / (args.time_budget * args.seeds)
+        print(f"{name:<28}{sum(scores) / len(scores):>10.1f}{max(scores):>10.1f}{rate:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
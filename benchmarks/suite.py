@@ -0,0 +1,332 @@
+"""
+Benchmark suite for trajectory enumeration, K-score evaluation, find_routes, greedy selection
+and the optimizers on the Dutch networks and on synthetic networks.
+
+Every benchmark reports operations per second, peak memory (measured with tracemalloc in a
+second run, so it does not slow down the timed run) and the K-score it reached, if any.
+Results are written as JSON, and a previous results file can be passed to compare against.
+
+Run from the repository root:
+    python -m benchmarks [--networks NL NZ-Holland synthetic] [--benchmarks greedy hill_climber]
+                         [--iterations 2000] [--output results.json] [--compare old.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime, timezone
+import numpy as np
+from algorithms.depth_first import DepthFirstRailNetwork
+from algorithms.depthclimber import DepthClimberRailNetwork
+from algorithms.greedy_selector import GreedyRouteSelector
+from algorithms.hillclimbrandom import HillClimberRailNetwork
+from algorithms.moves import RouteMoves
+from algorithms.random_baseline import Baseline
+from algorithms.simulated_annealing import SimulatedAnnealingRailNetwork
+from algorithms.tabu_search import TabuSearchRailNetwork
+from classes.rail_network import RailNetwork
+from utils.helper import iter_trajectories
+from utils.scoring import IncrementalKScore, calculate_K_score
+from benchmarks.synthetic import write_synthetic_network
+
+NetworkCase = namedtuple('NetworkCase', ['name', 'stations_file', 'connections_file', 'time_limit', 'max_routes'])
+
+NETWORKS = {
+    "NL": NetworkCase("NL", "data/NL/StationsNationaal.csv", "data/NL/ConnectiesNationaal.csv", 180, 20),
+    "NZ-Holland": NetworkCase("NZ-Holland", "data/NZ-Holland/StationsHolland.csv", "data/NZ-Holland/ConnectiesHolland.csv", 120, 7),
+}
+
+
+def load_network(network_class, case):
+    network = network_class(case.time_limit)
+    network.load_stations(case.stations_file)
+    network.load_connections(case.connections_file)
+    return network
+
+
+def bench_enumeration(case, args):
+    network = load_network(RailNetwork, case)
+
+    def run():
+        count = sum(1 for _ in iter_trajectories(network, case.time_limit, 100, canonical=True))
+        return count, None
+    return run
+
+
+def bench_k_score(case, args):
+    network = load_network(HillClimberRailNetwork, case)
+    solutions = [network.random_solution(case.max_routes).to_station_routes(network) for _ in range(100)]
+
+    def run():
+        for i in range(args.iterations):
+            calculate_K_score(solutions[i % len(solutions)], network.connections)
+        return args.iterations, None
+    return run
+
+
+def bench_incremental_k_score(case, args):
+    network = load_network(HillClimberRailNetwork, case)
+    solution = network.random_solution(case.max_routes)
+    scorer = IncrementalKScore(network.connections, solution)
+    proposals = [network.propose_swap(solution) for _ in range(100)]
+
+    def run():
+        for i in range(args.iterations):
+            scorer.score_with(proposals[i % len(proposals)])
+        return args.iterations, None
+    return run
+
+
+def bench_find_routes(case, args):
+    network = load_network(DepthFirstRailNetwork, case)
+    num_stations = len(network.station_names)
+    pairs = [(random.randrange(num_stations), random.randrange(num_stations)) for _ in range(args.route_pairs)]
+
+    def run():
+        for start_station, end_station in pairs:
+            network.find_route_ids(start_station, end_station, case.time_limit)
+        return len(pairs), None
+    return run
+
+
+def bench_greedy(case, args):
+    network = load_network(RailNetwork, case)
+    trajectories = list(iter_trajectories(network, case.time_limit, 100, canonical=True))
+    selector = GreedyRouteSelector(network.connections)
+
+    def run():
+        routes = selector.lazy_greedy_optimization(trajectories, case.max_routes, case.time_limit)
+        return len(trajectories), calculate_K_score(routes, network.connections)
+    return run
+
+
+def bench_bounded_greedy(case, args):
+    network = load_network(RailNetwork, case)
+    selector = GreedyRouteSelector(network.connections)
+
+    def run():
+        routes = selector.bounded_greedy_optimization(network, case.max_routes, case.time_limit)
+        return len(routes), calculate_K_score(routes, network.connections)
+    return run
+
+
+def bench_random_baseline(case, args):
+    network = load_network(Baseline, case)
+    network.compile()
+
+    def run():
+        scores = network.calculate_kscore_trajectories(case.time_limit, args.iterations, seed=args.seed)
+        return args.iterations, float(max(scores))
+    return run
+
+
+def bench_hill_climber(case, args):
+    network = load_network(HillClimberRailNetwork, case)
+
+    def run():
+        _, best_K_score, _, _ = network.hill_climber_optimization(args.iterations, case.max_routes, record_trajectories=False, verbose=False)
+        return args.iterations, best_K_score
+    return run
+
+
+def bench_hill_climber_moves(case, args):
+    network = load_network(HillClimberRailNetwork, case)
+    moves = RouteMoves(network, max_routes=case.max_routes)
+
+    def run():
+        _, best_K_score, _, _ = network.hill_climber_optimization(args.iterations, case.max_routes, record_trajectories=False, verbose=False, moves=moves)
+        return args.iterations, best_K_score
+    return run
+
+
+def bench_simulated_annealing(case, args):
+    network = load_network(SimulatedAnnealingRailNetwork, case)
+
+    def run():
+        _, best_K_score, _, _ = network.simulated_annealing(args.iterations, case.max_routes, record_trajectories=False, verbose=False)
+        return args.iterations, best_K_score
+    return run
+
+
+def bench_tabu_search(case, args):
+    network = load_network(TabuSearchRailNetwork, case)
+
+    def run():
+        _, best_K_score, _, _ = network.tabu_search(args.iterations, case.max_routes, record_trajectories=False, verbose=False)
+        return args.iterations, best_K_score
+    return run
+
+
+def bench_depth_climber(case, args):
+    network = load_network(DepthClimberRailNetwork, case)
+    initial_trajectories = network.generate_initial_trajectories(case.max_routes, sampling=True)
+
+    def run():
+        _, best_K_score, _, _ = network.hill_climber_depth_first(args.iterations, initial_trajectories, sampling=True, record_trajectories=False)
+        return args.iterations, best_K_score
+    return run
+
+
+BENCHMARKS = {
+    "enumeration": bench_enumeration,
+    "k_score": bench_k_score,
+    "incremental_k_score": bench_incremental_k_score,
+    "find_routes": bench_find_routes,
+    "greedy": bench_greedy,
+    "bounded_greedy": bench_bounded_greedy,
+    "random_baseline": bench_random_baseline,
+    "hill_climber": bench_hill_climber,
+    "hill_climber_moves": bench_hill_climber_moves,
+    "simulated_annealing": bench_simulated_annealing,
+    "tabu_search": bench_tabu_search,
+    "depth_climber": bench_depth_climber,
+}
+
+
+def measure(benchmark, case, args, trace_memory):
+    """
+    Runs a benchmark once on a network and returns its operations, seconds, K-score and,
+    with trace_memory, the peak memory in bytes. Setup is not part of the measurement.
+    """
+    random.seed(args.seed)
+    run = benchmark(case, args)
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    operations, quality = run()
+    seconds = time.perf_counter() - start
+    peak_memory = None
+    if trace_memory:
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return operations, seconds, quality, peak_memory
+
+
+def run_benchmark(name, case, args):
+    """
+    Returns the result of one benchmark on one network as a dict.
+    The fastest of args.repeat timed runs is reported.
+    """
+    # Printed output of the optimizers is not part of the benchmark
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        timings = [measure(BENCHMARKS[name], case, args, False) for _ in range(args.repeat)]
+        operations, seconds, quality, _ = min(timings, key=lambda timing: timing[1])
+        peak_memory = measure(BENCHMARKS[name], case, args, True)[3] if args.memory else None
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    return {
+        "benchmark": name,
+        "network": case.name,
+        "operations": operations,
+        "seconds": seconds,
+        "ops_per_second": operations / seconds if seconds > 0 else None,
+        "peak_memory_bytes": peak_memory,
+        "K_score": quality,
+    }
+
+
+def environment():
+    """
+    Returns the Python, NumPy and git versions the benchmarks ran with.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "commit": commit,
+    }
+
+
+def compare(results, previous_file):
+    """
+    Prints the change in operations per second and K-score against an earlier results file.
+    """
+    with open(previous_file) as file:
+        previous = {(result["benchmark"], result["network"]): result for result in json.load(file)["results"]}
+
+    print()
+    print(f"Compared to {previous_file}:")
+    print(f"{'benchmark':<22}{'network':<16}{'speedup':>10}{'K-score change':>16}")
+    for result in results:
+        old = previous.get((result["benchmark"], result["network"]))
+        if old is None:
+            continue
+        speedup = "-"
+        if result["ops_per_second"] and old["ops_per_second"]:
+            speedup = f"{result['ops_per_second'] / old['ops_per_second']:.2f}x"
+        quality = "-"
+        if result["K_score"] is not None and old["K_score"] is not None:
+            quality = f"{result['K_score'] - old['K_score']:+.1f}"
+        print(f"{result['benchmark']:<22}{result['network']:<16}{speedup:>10}{quality:>16}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark search, scoring and optimizers.")
+    parser.add_argument("--networks", nargs="+", default=["NL", "NZ-Holland", "synthetic"], help="NL, NZ-Holland and/or synthetic")
+    parser.add_argument("--benchmarks", nargs="+", default=list(BENCHMARKS), choices=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--synthetic-sizes", type=int, nargs="+", default=[200], help="amount of stations of the synthetic networks")
+    parser.add_argument("--synthetic-time-limit", type=int, default=90, help="time limit in minutes on synthetic networks")
+    parser.add_argument("--iterations", type=int, default=2000, help="iterations of the optimizers and K-score evaluations")
+    parser.add_argument("--route-pairs", type=int, default=100, help="station pairs searched by find_routes")
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per benchmark, the fastest is reported")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip the extra run that measures peak memory")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of every benchmark")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file to write the results to")
+    parser.add_argument("--compare", help="earlier JSON results file to compare with")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp()
+    try:
+        cases = []
+        for name in args.networks:
+            if name == "synthetic":
+                for size in args.synthetic_sizes:
+                    stations_file, connections_file = write_synthetic_network(directory, size, args.seed)
+                    cases.append(NetworkCase(f"synthetic-{size}", stations_file, connections_file, args.synthetic_time_limit, 20))
+            elif name in NETWORKS:
+                cases.append(NETWORKS[name])
+            else:
+                parser.error(f"unknown network {name!r}")
+
+        results = []
+        print(f"{'benchmark':<22}{'network':<16}{'ops/s':>12}{'seconds':>10}{'peak MB':>10}{'K-score':>10}")
+        for case in cases:
+            for name in args.benchmarks:
+                result = run_benchmark(name, case, args)
+                results.append(result)
+
+                peak = f"{result['peak_memory_bytes'] / 1e6:.1f}" if result["peak_memory_bytes"] is not None else "-"
+                quality = f"{result['K_score']:.1f}" if result["K_score"] is not None else "-"
+                print(f"{name:<22}{case.name:<16}{result['ops_per_second']:>12.0f}{result['seconds']:>10.3f}{peak:>10}{quality:>10}")
+    finally:
+        shutil.rmtree(directory)
+
+    with open(args.output, 'w') as file:
+        json.dump({"environment": environment(), "settings": vars(args), "results": results}, file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Generates synthetic rail networks in the csv format of data/NL, to measure how the algorithms scale with the size of the network.
+
+Stations are placed around random cities with some spread over the countryside. Tracks follow the
+relative neighbourhood graph of the stations, which connects every station to its nearby stations
+without crossings, like the skeleton of a real rail network, and a part of the extra edges of the
+Gabriel graph adds some junctions. Travel times follow from the length of a track and a train speed,
+mostly 5 to 30 minutes with a few long tracks, like the national network. The same seed gives the same network.
+
+Run from the repository root to write the csv files:
+    python -m benchmarks.synthetic 5000 [--seed 0] [--directory data/synthetic]
+"""
+import argparse
+import csv
+import math
+import os
+import tempfile
+import numpy as np
+from classes.rail_network import RailNetwork
+
+# Square kilometres per station, about the density of the national network
+AREA_PER_STATION = 1200
+STATIONS_PER_CITY = 20
+CLUSTERED_FRACTION = 0.6
+CITY_SPREAD = 15
+NEAREST_NEIGHBOURS = 10
+MIN_SPEED, MAX_SPEED = 70, 140
+MIN_TIME = 5
+
+
+def station_positions(num_stations, rng):
+    """
+    Returns the positions of the stations in kilometres, clustered around cities.
+    """
+    side = math.sqrt(num_stations * AREA_PER_STATION)
+    num_cities = max(1, num_stations // STATIONS_PER_CITY)
+    cities = rng.uniform(0, side, size=(num_cities, 2))
+
+    positions = rng.uniform(0, side, size=(num_stations, 2))
+    clustered = rng.random(num_stations) < CLUSTERED_FRACTION
+    city = rng.integers(num_cities, size=int(clustered.sum()))
+    positions[clustered] = cities[city] + rng.normal(0, CITY_SPREAD, size=(len(city), 2))
+    return np.clip(positions, 0, side)
+
+
+def nearest_neighbours(positions, k, chunk_size=512):
+    """
+    Returns for every station its k nearest other stations sorted by distance, and their squared distances.
+    """
+    k = min(k, len(positions) - 1)
+    neighbours = np.empty((len(positions), k), dtype=np.int64)
+    for start in range(0, len(positions), chunk_size):
+        chunk = positions[start:start + chunk_size]
+        squared = ((chunk[:, None, :] - positions[None, :, :]) ** 2).sum(axis=2)
+        squared[np.arange(len(chunk)), np.arange(start, start + len(chunk))] = np.inf
+
+        closest = np.argpartition(squared, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(squared, closest, axis=1), axis=1)
+        neighbours[start:start + chunk_size] = np.take_along_axis(closest, order, axis=1)
+
+    distances = ((positions[:, None, :] - positions[neighbours]) ** 2).sum(axis=2)
+    return neighbours, distances
+
+
+def proximity_edges(positions, k=NEAREST_NEIGHBOURS):
+    """
+    Returns the edges of the relative neighbourhood graph and the other edges of the Gabriel graph.
+
+    An edge between p and q is in the relative neighbourhood graph if no station r is closer to both p
+    and q than they are to each other, and in the Gabriel graph if no station lies in the circle with
+    p and q on its edge. Such a station r is closer to p than q is, so when q is one of the k nearest
+    neighbours of p only the nearer neighbours have to be checked. Longer edges are left out.
+    """
+    neighbours, distances = nearest_neighbours(positions, k)
+    relative, gabriel = set(), set()
+
+    for j in range(neighbours.shape[1]):
+        stations = np.arange(len(positions))
+        others = neighbours[:, j]
+        length = distances[:, j]
+
+        # Nearer neighbours of p are the only stations that can block the edge to q
+        closer = neighbours[:, :j]
+        to_p = distances[:, :j]
+        to_q = ((positions[closer] - positions[others][:, None, :]) ** 2).sum(axis=2)
+        in_relative = ~(to_q < length[:, None]).any(axis=1)
+        in_gabriel = ~(to_p + to_q < length[:, None]).any(axis=1)
+
+        for station, other, is_relative, is_gabriel in zip(stations.tolist(), others.tolist(), in_relative.tolist(), in_gabriel.tolist()):
+            edge = (min(station, other), max(station, other))
+            if is_relative:
+                relative.add(edge)
+            elif is_gabriel:
+                gabriel.add(edge)
+
+    return sorted(relative), sorted(gabriel - relative)
+
+
+def connect_components(positions, edges):
+    """
+    Adds the shortest edge between a component and the rest of the network until the network is connected.
+    """
+    parent = list(range(len(positions)))
+
+    def find(station):
+        while parent[station] != station:
+            parent[station] = parent[parent[station]]
+            station = parent[station]
+        return station
+
+    for station, other in edges:
+        parent[find(station)] = find(other)
+
+    while True:
+        roots = np.array([find(station) for station in range(len(positions))])
+        components = np.unique(roots)
+        if len(components) == 1:
+            return edges
+
+        smallest = min(components, key=lambda root: (roots == root).sum())
+        inside = np.flatnonzero(roots == smallest)
+        outside = np.flatnonzero(roots != smallest)
+        squared = ((positions[inside][:, None, :] - positions[outside][None, :, :]) ** 2).sum(axis=2)
+        a, b = np.unravel_index(np.argmin(squared), squared.shape)
+        station, other = int(inside[a]), int(outside[b])
+        edges.append((min(station, other), max(station, other)))
+        parent[find(station)] = find(other)
+
+
+def generate_synthetic_network(num_stations, seed=0, gabriel_fraction=0.3):
+    """
+    Returns the stations as (name, latitude, longitude) tuples and the connections as
+    (station1, station2, minutes) tuples of a synthetic network.
+    gabriel_fraction is the part of the extra Gabriel graph edges that is added to the tracks.
+    """
+    rng = np.random.default_rng(seed)
+    positions = station_positions(num_stations, rng)
+
+    edges = []
+    if num_stations > 1:
+        relative, gabriel = proximity_edges(positions)
+        edges = relative + [edge for edge in gabriel if rng.random() < gabriel_fraction]
+        edges = connect_components(positions, edges)
+
+    names = [f"Station {i}" for i in range(num_stations)]
+
+    # Place the network at the latitude of the Netherlands, one degree of latitude is 111 km
+    latitudes = 51 + positions[:, 1] / 111
+    longitudes = 3.5 + positions[:, 0] / (111 * math.cos(math.radians(52)))
+    stations = list(zip(names, latitudes.round(6).tolist(), longitudes.round(6).tolist()))
+
+    connections = []
+    for station, other in edges:
+        length = float(np.hypot(*(positions[station] - positions[other])))
+        speed = rng.uniform(MIN_SPEED, MAX_SPEED)
+        minutes = max(MIN_TIME, round(length / speed * 60 + rng.uniform(1, 3)))
+        connections.append((names[station], names[other], minutes))
+
+    return stations, connections
+
+
+def write_synthetic_network(directory, num_stations, seed=0, gabriel_fraction=0.3):
+    """
+    Write a station and connection csv for a synthetic rail network.
+    Returns the paths of the stations file and the connections file.
+    """
+    stations, connections = generate_synthetic_network(num_stations, seed, gabriel_fraction)
+
+    stations_file = os.path.join(directory, f"StationsSynthetic{num_stations}.csv")
+    connections_file = os.path.join(directory, f"ConnectiesSynthetic{num_stations}.csv")
+
+    with open(stations_file, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['station', 'y', 'x'])
+        writer.writerows(stations)
+
+    with open(connections_file, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['station1', 'station2', 'distance'])
+        writer.writerows(connections)
+
+    return stations_file, connections_file
+
+
+def build_synthetic_network(num_stations, max_time_limit=None, seed=0, network_class=RailNetwork):
+    """
+    Build a network of the given class loaded with a synthetic rail network.
+    """
+    network = network_class(max_time_limit)
+    with tempfile.TemporaryDirectory() as directory:
+        stations_file, connections_file = write_synthetic_network(directory, num_stations, seed)
+        network.load_stations(stations_file)
+        network.load_connections(connections_file)
+    return network
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic rail network as csv files.")
+    parser.add_argument("stations", type=int, help="amount of stations")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--gabriel-fraction", type=float, default=0.3, help="part of the extra Gabriel graph edges to add")
+    parser.add_argument("--directory", default="data/synthetic", help="directory to write the csv files to")
+    args = parser.parse_args()
+
+    os.makedirs(args.directory, exist_ok=True)
+    stations_file, connections_file = write_synthetic_network(args.directory, args.stations, args.seed, args.gabriel_fraction)
+
+    with open(connections_file, newline='') as file:
+        minutes = sorted(int(row['distance']) for row in csv.DictReader(file))
+    print(f"Wrote {stations_file} and {connections_file}")
+    print(f"{args.stations} stations, {len(minutes)} connections, mean degree {2 * len(minutes) / args.stations:.2f}")
+    if minutes:
+        print(f"Travel times: min {minutes[0]}, median {minutes[len(minutes) // 2]}, max {minutes[-1]} minutes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Times trajectory enumeration with utils.helper.find_trajectories on the national network
+and on synthetic networks of 500 to 5000 stations.
+
+Run from the repository root:
+    python -m benchmarks.trajectory_enumeration [--legacy]
+"""
+import argparse
+import time
+from collections import defaultdict
+from classes.rail_network import RailNetwork
+from utils.helper import find_trajectories
+from benchmarks.synthetic import build_synthetic_network
+
+
+def legacy_search(network, current_station, route, current_time, max_duration, max_stations, max_reuse, connection_usage, trajectories, visited):
+    """Original implementation that scans every connection at each recursion step."""
+    if 0 < current_time <= max_duration and len(route) <= max_stations:
+        trajectories.add((tuple(route), current_time))
+
+    for connection in network.connections:
+        if connection.station1.name == current_station or connection.station2.name == current_station:
+            neighbor = (connection.station2.name if connection.station1.name == current_station else connection.station1.name)
+            time_connection = connection.distance
+            connection_name = tuple(sorted((current_station, neighbor)))
+
+            if current_time + time_connection <= max_duration and connection_usage[connection_name] < max_reuse and neighbor not in visited:
+                connection_usage[connection_name] += 1
+                visited.add(neighbor)
+
+                legacy_search(network, neighbor, route + [neighbor], current_time + time_connection, max_duration, max_stations, max_reuse, connection_usage, trajectories, visited)
+
+                visited.remove(neighbor)
+                connection_usage[connection_name] -= 1
+
+
+def legacy_find_trajectories(network, max_duration, max_stations, max_reuse=1):
+    trajectories = set()
+    connection_usage = defaultdict(int)
+
+    for station in network.stations.keys():
+        legacy_search(network, station, [station], 0, max_duration, max_stations, max_reuse, connection_usage, trajectories, {station})
+
+    return list(trajectories)
+
+
+def time_enumeration(function, network, max_duration, max_stations):
+    """Returns the number of trajectories found and the time it took in seconds."""
+    start = time.perf_counter()
+    trajectories = function(network, max_duration, max_stations)
+    return len(trajectories), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark trajectory enumeration.")
+    parser.add_argument("--legacy", action="store_true", help="also time the original connection-scanning search")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 1000, 2000, 5000], help="synthetic network sizes")
+    parser.add_argument("--synthetic-duration", type=int, default=60, help="max duration for synthetic networks")
+    args = parser.parse_args()
+
+    cases = []
+
+    network = RailNetwork(180)
+    network.load_stations("data/NL/StationsNationaal.csv")
+    network.load_connections("data/NL/ConnectiesNationaal.csv")
+    cases.append(("NL", network, 180))
+
+    for size in args.sizes:
+        cases.append((f"synthetic-{size}", build_synthetic_network(size), args.synthetic_duration))
+
+    print(f"{'network':<16}{'stations':>10}{'edges':>8}{'limit':>7}{'trajectories':>14}{'adjacency (s)':>15}{'legacy (s)':>12}")
+    for name, network, max_duration in cases:
+        count, elapsed = time_enumeration(find_trajectories, network, max_duration, 100)
+        legacy = "-"
+        if args.legacy:
+            _, legacy_elapsed = time_enumeration(legacy_find_trajectories, network, max_duration, 100)
+            legacy = f"{legacy_elapsed:.2f}"
+        print(f"{name:<16}{len(network.stations):>10}{len(network.connections):>8}{max_duration:>7}{count:>14}{elapsed:>15.2f}{legacy:>12}")
+
+
+if __name__ == "__main__":
+    main()
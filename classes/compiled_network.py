@@ -0,0 +1,64 @@
+import numpy as np
+
+class CompiledNetwork:
+    """
+    Array representation of a RailNetwork with dense station IDs and CSR-style adjacency.
+
+    The connections of station i are found at positions offsets[i] to offsets[i + 1] of
+    neighbors (station IDs), weights (minutes) and edge_ids (indices into the connections of
+    the network). Every connection appears twice, once for each direction.
+    """
+    __slots__ = ('station_names', 'station_ids', 'x', 'y', 'offsets', 'neighbors', 'weights', 'edge_ids', 'edge_stations', 'edge_weights')
+
+    def __init__(self, network):
+        self.station_names = list(network.station_names)
+        self.station_ids = dict(network.station_ids)
+        self.x = np.array([network.stations[name].x for name in self.station_names], dtype=np.float64)
+        self.y = np.array([network.stations[name].y for name in self.station_names], dtype=np.float64)
+
+        degrees = np.array([len(connections) for connections in network.adjacency], dtype=np.int64)
+        self.offsets = np.zeros(len(self.station_names) + 1, dtype=np.int64)
+        np.cumsum(degrees, out=self.offsets[1:])
+
+        entries = [entry for connections in network.adjacency for entry in connections]
+        adjacency = np.array(entries, dtype=np.int64).reshape(-1, 3)
+        self.neighbors = adjacency[:, 0].astype(np.int32)
+        self.weights = adjacency[:, 1].astype(np.int32)
+        self.edge_ids = adjacency[:, 2].astype(np.int32)
+
+        self.edge_stations = np.array(
+            [(network.station_ids[connection.station1.name], network.station_ids[connection.station2.name]) for connection in network.connections],
+            dtype=np.int32,
+        ).reshape(-1, 2)
+        self.edge_weights = np.array([connection.distance for connection in network.connections], dtype=np.int32)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Builds a compiled network from stored arrays, for example the memory-mapped arrays of utils.cache.
+        """
+        compiled = cls.__new__(cls)
+        compiled.station_names = [str(name) for name in arrays['station_names']]
+        compiled.station_ids = {name: station_id for station_id, name in enumerate(compiled.station_names)}
+        for name in ('x', 'y', 'offsets', 'neighbors', 'weights', 'edge_ids', 'edge_stations', 'edge_weights'):
+            setattr(compiled, name, arrays[name])
+        return compiled
+
+    @property
+    def num_stations(self):
+        return len(self.station_names)
+
+    @property
+    def num_edges(self):
+        return len(self.edge_weights)
+
+    @property
+    def degrees(self):
+        return np.diff(self.offsets)
+
+    def station_connections(self, station):
+        """
+        Returns the neighbors, weights and edge IDs of a station as array views.
+        """
+        start, end = self.offsets[station], self.offsets[station + 1]
+        return self.neighbors[start:end], self.weights[start:end], self.edge_ids[start:end]
@@ -1,5 +1,7 @@
 class Connection:
+    __slots__ = ('station1', 'station2', 'distance')
+
     def __init__(self, station1, station2, distance):
         self.station1 = station1
         self.station2 = station2
-        self.distance = distance
\ No newline at end of file
+        self.distance = distance
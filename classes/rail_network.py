@@ -1,7 +1,15 @@
 from collections import defaultdict
 from classes.station import Station
 from classes.connection import Connection
+from classes.compiled_network import CompiledNetwork
+from utils.instrumentation import NO_INSTRUMENTATION, Recorder
 import csv
+import heapq
+import numpy as np
+
+# Above this amount of stations the shortest time matrix is built with Dijkstra from every station,
+# Floyd-Warshall takes a vectorized step per station but O(n^3) work, which loses on sparse rail networks
+FLOYD_WARSHALL_MAX_STATIONS = 500
 
 class RailNetwork:
     def __init__(self, max_time_limit=None):
@@ -10,19 +18,156 @@ class RailNetwork:
         self.connection_map = defaultdict(list)
         self.max_time_limit = max_time_limit
 
+        # Integer-indexed view of the network: station IDs follow the order of the
+        # stations file and edge IDs the order of self.connections
+        self.station_ids = {}
+        self.station_names = []
+        self.adjacency = []
+        self.compiled_network = None
+        self.shortest_times_cache = {}
+        self.shortest_time_matrix_cache = None
+        # Minutes of the connection between two station IDs, in both directions
+        self.connection_times = {}
+        self.instrumentation = NO_INSTRUMENTATION
+
+    def instrument(self, instrumentation=None):
+        """
+        Record timers, counters and events of the algorithms run on this network (utils.instrumentation).
+        Uses a new Recorder if no instrumentation is given, and returns the instrumentation.
+        """
+        self.instrumentation = instrumentation if instrumentation is not None else Recorder()
+        return self.instrumentation
+
     def load_stations(self, filepath):
         with open(filepath, 'r') as file:
             reader = csv.DictReader(file)
+            self.compiled_network = None
+            self.shortest_times_cache = {}
+            self.shortest_time_matrix_cache = None
             for row in reader:
-                self.stations[row['station']] = Station(row['station'], float(row['x']), float(row['y']))
-    
+                self.add_station(row['station'], float(row['x']), float(row['y']))
+
     def load_connections(self, filepath):
         with open(filepath, 'r') as file:
             reader = csv.DictReader(file)
+            self.compiled_network = None
+            self.shortest_times_cache = {}
+            self.shortest_time_matrix_cache = None
             for row in reader:
-                station1 = self.stations[row['station1']]
-                station2 = self.stations[row['station2']]
-                distance = int(row['distance'])
-                self.connections.append(Connection(station1, station2, distance))
-                self.connection_map[station1.name].append((station2.name, distance))
-                self.connection_map[station2.name].append((station1.name, distance))
\ No newline at end of file
+                self.add_connection(row['station1'], row['station2'], int(row['distance']))
+
+    def load_compiled(self, compiled):
+        """
+        Load the stations and connections of a compiled network, for example the memory-mapped arrays
+        of utils.cache, instead of the CSV files. The compiled network is kept as the array representation.
+        """
+        self.shortest_times_cache = {}
+        self.shortest_time_matrix_cache = None
+        for name, x, y in zip(compiled.station_names, compiled.x.tolist(), compiled.y.tolist()):
+            self.add_station(name, x, y)
+        for (station1_id, station2_id), distance in zip(compiled.edge_stations.tolist(), compiled.edge_weights.tolist()):
+            self.add_connection(compiled.station_names[station1_id], compiled.station_names[station2_id], distance)
+        self.compiled_network = compiled
+
+    def add_station(self, name, x, y):
+        """
+        Add a station while loading, a station that is added again only gets new coordinates.
+        """
+        self.stations[name] = Station(name, x, y)
+        if name not in self.station_ids:
+            self.station_ids[name] = len(self.station_names)
+            self.station_names.append(name)
+            self.adjacency.append([])
+
+    def add_connection(self, station1_name, station2_name, distance):
+        """
+        Add a connection between two loaded stations while loading.
+        """
+        station1 = self.stations[station1_name]
+        station2 = self.stations[station2_name]
+        self.connections.append(Connection(station1, station2, distance))
+        self.connection_map[station1.name].append((station2.name, distance))
+        self.connection_map[station2.name].append((station1.name, distance))
+
+        # Adjacency entries are (neighbor ID, distance, edge ID)
+        edge_id = len(self.connections) - 1
+        station1_id = self.station_ids[station1.name]
+        station2_id = self.station_ids[station2.name]
+        self.adjacency[station1_id].append((station2_id, distance, edge_id))
+        self.adjacency[station2_id].append((station1_id, distance, edge_id))
+
+        # With parallel connections the first one is kept, like a scan of the adjacency would find it
+        self.connection_times.setdefault((station1_id, station2_id), distance)
+        self.connection_times.setdefault((station2_id, station1_id), distance)
+
+    def compile(self):
+        """
+        Returns the array representation of the network, built once after loading.
+        """
+        if self.compiled_network is None:
+            self.compiled_network = CompiledNetwork(self)
+        return self.compiled_network
+
+    def connection_time(self, station1, station2):
+        """
+        Returns the minutes of the connection between two station IDs.
+        """
+        return self.connection_times[station1, station2]
+
+    def route_time(self, route):
+        """
+        Returns the total minutes of a route of station IDs.
+        """
+        connection_times = self.connection_times
+        return sum(connection_times[route[i], route[i + 1]] for i in range(len(route) - 1))
+
+    def shortest_time_matrix(self):
+        """
+        Returns the shortest travel times between all station IDs as an (n, n) NumPy array,
+        built once after loading. Unreachable stations get infinity.
+        """
+        if self.shortest_time_matrix_cache is not None:
+            return self.shortest_time_matrix_cache
+
+        num_stations = len(self.station_names)
+        if num_stations > FLOYD_WARSHALL_MAX_STATIONS:
+            times = np.array([self.shortest_times(source) for source in range(num_stations)], dtype=np.float64).reshape(num_stations, num_stations)
+        else:
+            times = np.full((num_stations, num_stations), np.inf)
+            np.fill_diagonal(times, 0)
+            for station, connections in enumerate(self.adjacency):
+                for neighbor, distance, _ in connections:
+                    times[station, neighbor] = min(times[station, neighbor], distance)
+
+            # Floyd-Warshall, every step allows the routes to pass through one more station
+            for station in range(num_stations):
+                np.minimum(times, times[:, station, None] + times[None, station, :], out=times)
+
+        self.shortest_time_matrix_cache = times
+        return times
+
+    def shortest_times(self, source):
+        """
+        Returns the shortest travel time from station ID source to every station ID,
+        using Dijkstra's algorithm. Unreachable stations get infinity.
+        """
+        if source in self.shortest_times_cache:
+            return self.shortest_times_cache[source]
+        if self.shortest_time_matrix_cache is not None:
+            self.shortest_times_cache[source] = self.shortest_time_matrix_cache[source].tolist()
+            return self.shortest_times_cache[source]
+
+        times = [float('inf')] * len(self.station_names)
+        times[source] = 0
+        queue = [(0, source)]
+        while queue:
+            time, station = heapq.heappop(queue)
+            if time > times[station]:
+                continue
+            for neighbor, distance, _ in self.adjacency[station]:
+                if time + distance < times[neighbor]:
+                    times[neighbor] = time + distance
+                    heapq.heappush(queue, (time + distance, neighbor))
+
+        self.shortest_times_cache[source] = times
+        return times
@@ -0,0 +1,74 @@
+from collections import namedtuple
+
+# A route as a tuple of station IDs together with its total time in minutes.
+# Routes unpack like the (route, total_time) tuples used everywhere else.
+Route = namedtuple('Route', ['stations', 'time'])
+
+class Solution:
+    """
+    Immutable set of routes that make up a solution.
+
+    Routes are never changed, so replace() creates a new solution that shares every route
+    that was not replaced instead of copying the whole solution.
+    """
+    __slots__ = ('routes',)
+
+    def __init__(self, routes=()):
+        self.routes = tuple(routes)
+
+    def __len__(self):
+        return len(self.routes)
+
+    def __iter__(self):
+        return iter(self.routes)
+
+    def __getitem__(self, index):
+        return self.routes[index]
+
+    def replace(self, replacements):
+        """
+        Returns a new solution where the routes at the indices of replacements are replaced.
+        replacements maps route indices to new routes. A route replaced by None is removed, and routes
+        at indices from len(self) on are added after the other routes in the order of their indices.
+        """
+        routes = list(self.routes)
+        num_routes = len(routes)
+        added = []
+        for index, route in replacements.items():
+            if index < num_routes:
+                routes[index] = route
+            else:
+                added.append((index, route))
+
+        if added or None in routes:
+            routes = [route for route in routes if route is not None] + [route for _, route in sorted(added)]
+        return Solution(routes)
+
+    @property
+    def total_time(self):
+        return sum(route.time for route in self.routes)
+
+    @classmethod
+    def from_station_routes(cls, trajectories, network):
+        """
+        Create a solution from a list of (route, total_time) tuples with routes of Station objects.
+        """
+        return cls(
+            Route(tuple(network.station_ids[station.name] for station in route), total_time)
+            for route, total_time in trajectories
+        )
+
+    def to_station_routes(self, network):
+        """
+        Returns the solution as a list of (route, total_time) tuples with routes of Station objects.
+        """
+        return [
+            ([network.stations[network.station_names[station]] for station in route.stations], route.time)
+            for route in self.routes
+        ]
+
+    def station_names(self, network):
+        """
+        Returns the station names of every route in the solution.
+        """
+        return [[network.station_names[station] for station in route.stations] for route in self.routes]
@@ -1,196 +1,693 @@
+"""
+Runs the experiments from the command line, for example:
+
+    python main.py greedy --dataset NZ-Holland
+    python main.py hill-climber --iterations 5000 --seed 1 --format csv
+    python main.py sweep experiments.json
+    python main.py serve --workers 4
+
+Every algorithm has its own subcommand, see `python main.py <subcommand> --help` for its options.
+Runs are headless: plots are saved as files with --save-plots and only shown with --show-plots.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from array import array
 from classes.rail_network import RailNetwork
+from classes.solution import Solution
 from algorithms.greedy_selector import GreedyRouteSelector
-from utils.helper import find_trajectories
-from utils.scoring import calculate_K_score
-from visualizer import visualize_network_on_map, plot_k_score_distribution, plot_scores_from_csv, plot_trajectory_length_vs_score
+from algorithms.exact_selector import ExactRouteSelector
 from algorithms.depthclimber import DepthClimberRailNetwork
-import csv
 from algorithms.random_baseline import Baseline
 from algorithms.hillclimbrandom import HillClimberRailNetwork
-import os
-def run_hill_climber_random():
+from algorithms.moves import RouteMoves
+from utils.cache import cached_route_table, cached_trajectories, load_compiled_network
+from utils.checkpoint import Checkpoint
+from utils.instrumentation import EventLog, Recorder
+from utils.parallel import iter_parallel_hill_climber
+from utils.results import RESULT_FORMATS, open_result_sink
+from utils.scoring import calculate_K_score
+
+# Stations file, connections file, time limit in minutes and maximum amount of trajectories
+DATASETS = {
+    "NL": ("data/NL/StationsNationaal.csv", "data/NL/ConnectiesNationaal.csv", 180, 20),
+    "NZ-Holland": ("data/NZ-Holland/StationsHolland.csv", "data/NZ-Holland/ConnectiesHolland.csv", 120, 7),
+}
+
+def dataset_files(args):
     """
-    Runs the Hill Climber Random algorithm and saves the results to a CSV file.
+    Returns the stations file and connections file of the run, custom files take precedence over the dataset.
     """
-    rail_network = HillClimberRailNetwork(max_time_limit=180)
-    rail_network.load_stations("data/NL/StationsNationaal.csv")
-    rail_network.load_connections("data/NL/ConnectiesNationaal.csv")
-    full_k_scores = []
-    real_highst_k = 0
-    real_best_traject = None
+    stations_file, connections_file, _, _ = DATASETS[args.dataset]
+    return args.stations_file or stations_file, args.connections_file or connections_file
+
+def load_network(network_class, args):
+    stations_file, connections_file = dataset_files(args)
+    network = network_class(args.time_limit)
+    network.load_stations(stations_file)
+    network.load_connections(connections_file)
+    if args.profile or args.progress:
+        recorder = Recorder(profile_path=args.profile)
+        if args.progress:
+            recorder.add_observer(EventLog(args.progress))
+        network.instrument(recorder)
+    return network
+
+def output_path(args, name):
+    os.makedirs(args.output_dir, exist_ok=True)
+    return os.path.join(args.output_dir, name)
+
+def plots_enabled(args):
+    return args.show_plots or args.save_plots
+
+def plot_path(args, name):
+    """
+    Returns the file a plot is saved to, or None if plots are shown.
+    """
+    if args.show_plots:
+        return None
+    return output_path(args, os.path.join("plots", f"{name}.png"))
+
+def visualizer(args):
+    """
+    Imports the plotting functions only when plots are made, so runs without plots do not need matplotlib.
+    Saved plots are rendered with the Agg backend, which needs no display.
+    """
+    import visualizer
+    if not args.show_plots:
+        visualizer.use_headless_backend()
+    return visualizer
+
+# Options that may differ between a run and the run that resumes it
+RESUME_IGNORED_OPTIONS = ("resume", "checkpoint_interval", "verbose", "profile", "progress", "basemap")
+
+def open_checkpoint(args):
+    """
+    Returns the Checkpoint of a run with --checkpoint, or None. With --resume and an existing checkpoint file
+    the run continues from it, which needs the same settings as the run that wrote it.
+    """
+    if not args.checkpoint:
+        return None
+
+    settings = {name: value for name, value in vars(args).items() if name not in RESUME_IGNORED_OPTIONS}
+    if args.resume and os.path.exists(args.checkpoint):
+        checkpoint = Checkpoint.load(args.checkpoint, args.checkpoint_interval)
+        if checkpoint.state['settings'] != settings:
+            raise ValueError(f"Checkpoint '{args.checkpoint}' was written by a run with other settings")
+        print(f"Resuming from checkpoint '{args.checkpoint}'.")
+        return checkpoint
+    return Checkpoint(args.checkpoint, args.checkpoint_interval, {'settings': settings})
+
+def resume_runs(checkpoint, network, first_num_routes):
+    """
+    Returns the amount of routes of the next run, and the highest K-score, best trajectory, K-scores and
+    recorded trajectories of the runs that finished before the checkpoint. Restores the random state
+    at the start of the next run.
+    """
+    runs = checkpoint.resume('runs') if checkpoint is not None else None
+    if runs is None:
+        return first_num_routes, float('-inf'), None, [], []
+
+    random.setstate(runs['random'])
+    best_traject = runs['best_solution'].to_station_routes(network) if runs['best_solution'] is not None else None
+    return runs['num_routes'], runs['best_K'], best_traject, list(runs['k_scores']), list(runs['trajectories'])
+
+def save_runs(checkpoint, network, num_routes, best_K, best_traject, k_scores, trajectories=()):
+    """
+    Store the results of the finished runs in the checkpoint before the run with num_routes routes starts.
+    The optimizer saves them along with its own state.
+    """
+    checkpoint.state['runs'] = {
+        'num_routes': num_routes,
+        'random': random.getstate(),
+        'best_K': best_K,
+        'best_solution': Solution.from_station_routes(best_traject, network) if best_traject is not None else None,
+        'k_scores': array('d', k_scores),
+        'trajectories': list(trajectories),
+    }
+
+def print_best_run(best_K, best_traject):
+    """
+    Prints the highest K-score of the runs and its amount of routes, and returns the K-score or None without runs.
+    """
+    if best_traject is None:
+        print("No runs were done.")
+        return None
+    print("Highest K-Score:", best_K)
+    print("Number of Routes used:", len(best_traject))
+    return best_K
+
+def print_trajectories(trajectories):
+    for i, (route, duration) in enumerate(trajectories, start=1):
+        print(f"Trajectory {i}: {' -> '.join(route)}, Duration: {duration} minutes")
+
+def print_profile(network):
+    if network.instrumentation.enabled:
+        print(network.instrumentation.summary())
+
+def run_hill_climber_random(args):
+    """
+    Runs the Hill Climber Random algorithm for min_routes to max_routes routes and streams the K-score
+    and trajectory of every iteration to Randomhillclimberdata in the chosen format (utils.results).
+    """
+    rail_network = load_network(HillClimberRailNetwork, args)
+    random.seed(args.seed)
+    moves = RouteMoves(rail_network, max_routes=args.max_routes) if args.moves else None
+    checkpoint = open_checkpoint(args)
+    first_routes, real_highst_k, real_best_traject, full_k_scores, _ = resume_runs(checkpoint, rail_network, args.min_routes)
+
+    sink_position = checkpoint.state.get('sink') if checkpoint is not None else None
+    with open_result_sink(output_path(args, 'Randomhillclimberdata'), rail_network.station_names, args.format, position=sink_position) as sink:
+        if checkpoint is not None:
+            checkpoint.sink = sink
+
+        for i in range(first_routes, args.max_routes + 1):
+            if checkpoint is not None:
+                save_runs(checkpoint, rail_network, i, real_highst_k, real_best_traject, full_k_scores)
+
+            # Trajectories go to the sink in batches instead of being kept for every iteration
+            best_traject, highest_K, k_score_list, _ = rail_network.hill_climber_optimization(
+                num_iterations=args.iterations, num_routes=i, record_trajectories=False, verbose=args.verbose, sink=sink,
+                moves=moves, checkpoint=checkpoint
+            )
 
-    with open('Randomhillclimberdata.csv', mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(["K-score", "Trajectory"])
-        
-        for i in range(8, 21):
-            best_traject, highest_K, k_score_list, trajectory_list = rail_network.hill_climber_optimization(num_iterations=20000, num_routes=i)
-            
-            # Write each K-score and its corresponding trajectory to the CSV file
-            for k_score, trajectory in zip(k_score_list, trajectory_list):
-                trajectory_str = ' -> '.join([str(station) for station in trajectory]) 
-                writer.writerow([k_score, trajectory_str])
-            
             if highest_K > real_highst_k:
                 real_highst_k = highest_K
                 real_best_traject = best_traject
 
             full_k_scores += k_score_list
 
-    print("Highest K-Score:", real_highst_k)
-    print("Number of Routes used:", len(real_best_traject))
-    plot_k_score_distribution(full_k_scores)
-
-def run_greedy(rail_network, stations_file, connections_file):
-     # Generate possible trajectories 
-    max_duration = 180
-    max_stations = 100
-    max_reuse = 1
-    trajectories = find_trajectories(rail_network, max_duration, max_stations, max_reuse)
-     
+    if checkpoint is not None:
+        checkpoint.remove()
+
+    real_highst_k = print_best_run(real_highst_k, real_best_traject)
+    print(f"Results of every iteration are saved in '{sink.path}'.")
+    print_profile(rail_network)
+    if plots_enabled(args):
+        visualizer(args).plot_k_score_distribution(full_k_scores, plot_path(args, "hill_climber_k_scores"))
+
+    return {"K_score": real_highst_k, "trajectories": real_best_traject, "output": sink.path}
+
+def run_hill_climber_parallel(args):
+    """
+    Runs the Hill Climber Random algorithm for min_routes to max_routes routes with several random restarts
+    on all cores and saves the best K-score of every run to a CSV file.
+    """
+    stations_file, connections_file = dataset_files(args)
+    full_k_scores = []
+    real_highst_k = float('-inf')
+    real_best_traject = None
+
+    csv_output_file = output_path(args, 'Randomhillclimberparallel.csv')
+    with open(csv_output_file, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(["Routes", "Restart", "Seed", "K-score", "Trajectory"])
+
+        # Results are streamed back as soon as a run finishes
+        for result in iter_parallel_hill_climber(stations_file, connections_file, args.time_limit, range(args.min_routes, args.max_routes + 1),
+                                                 restarts=args.restarts, num_iterations=args.iterations, workers=args.workers,
+                                                 base_seed=args.seed, keep_scores=plots_enabled(args)):
+            trajectory_str = ' -> '.join([str(route) for route, _ in result["best_routes"]])
+            writer.writerow([result["num_routes"], result["restart"], result["seed"], result["best_K_score"], trajectory_str])
+
+            if result["best_K_score"] > real_highst_k:
+                real_highst_k = result["best_K_score"]
+                real_best_traject = result["best_routes"]
+
+            if result["k_scores"] is not None:
+                full_k_scores += result["k_scores"]
+
+    real_highst_k = print_best_run(real_highst_k, real_best_traject)
+    print(f"The best K-score of every run is saved in '{csv_output_file}'.")
+    if plots_enabled(args):
+        visualizer(args).plot_k_score_distribution(full_k_scores, plot_path(args, "parallel_k_scores"))
+
+    return {"K_score": real_highst_k, "trajectories": real_best_traject, "output": csv_output_file}
+
+def run_greedy(args):
+    """
+    Selects trajectories greedily from all possible trajectories.
+    """
+    rail_network = load_network(RailNetwork, args)
+    stations_file, connections_file = dataset_files(args)
+
     # Greedy Algorithm
     greedy = GreedyRouteSelector(rail_network.connections)
-    optimized_trajectory_greedy = greedy.greedy_optimization(trajectories)
+    greedy.instrument(rail_network.instrumentation)
+    if args.bounded:
+        # Every route is generated with branch-and-bound, no trajectories are enumerated
+        optimized_trajectory_greedy = greedy.bounded_greedy_optimization(rail_network, args.max_routes, args.time_limit, args.max_stations)
+    else:
+        # Possible trajectories in one driving direction, enumerated once and read from the on-disk cache afterwards
+        trajectories = cached_trajectories(rail_network, stations_file, connections_file, args.time_limit, args.max_stations, canonical=True)
+        if args.lazy:
+            optimized_trajectory_greedy = greedy.lazy_greedy_optimization(trajectories, args.max_routes, args.time_limit)
+        else:
+            optimized_trajectory_greedy = greedy.greedy_optimization(trajectories, args.max_routes, args.time_limit)
 
-    # Calculate k score 
+    # Calculate k score
     k_score_greedy = calculate_K_score(optimized_trajectory_greedy, rail_network.connections)
     print(f"The K-score for Greedy optimization is: {k_score_greedy}")
 
-    # Print optimized trajectories 
+    # Print optimized trajectories
     print("The optimized trajectories are:")
-    i = 1 
-    for route, duration in optimized_trajectory_greedy:
-        print(f"Trajectory {i}: {' -> '.join(route)}, Duration: {duration} minutes")
-        print()
-        i += 1
-    
-    # Visualize the final greedy network 
-    visualize_network_on_map(rail_network, optimized_trajectory_greedy)
-
-def run_depth_climber(stations_file, connections_file):
-    """--- Depth Climber ---"""
-    depth_network = DepthClimberRailNetwork(max_time_limit=180)
-    depth_network.load_stations(stations_file)
-    depth_network.load_connections(connections_file)
-
-    # Setup Depth Climber experiment
-    full_k_scores = []
-    all_trajectories = []
-    real_highst_k = 0
-    real_best_traject = None
+    print_trajectories(optimized_trajectory_greedy)
+    print_profile(rail_network)
 
-    csv_output_file = 'data/nz-holland/depthclimberdataNZ.csv'
-    os.makedirs(os.path.dirname(csv_output_file), exist_ok=True)
-    
-    with open(csv_output_file, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(['K-Score', 'Trajectory'])
-        
-        for i in range(2, 21):
-            initial_trajectories = depth_network.generate_initial_trajectories(num_trajectories=i)
+    # Visualize the final greedy network
+    if plots_enabled(args):
+        visualizer(args).visualize_network_on_map(rail_network, optimized_trajectory_greedy, plot_path(args, "greedy_map"), basemap=args.basemap)
+
+    return {"K_score": k_score_greedy, "trajectories": optimized_trajectory_greedy}
+
+def run_exact(args):
+    """
+    Selects trajectories with branch-and-bound over all possible trajectories. The result is optimal
+    unless a limit stops the search early, then it reports how far the result can be from the optimum.
+    """
+    rail_network = load_network(RailNetwork, args)
+    stations_file, connections_file = dataset_files(args)
+    trajectories = cached_trajectories(rail_network, stations_file, connections_file, args.time_limit, args.max_stations, canonical=True)
+
+    exact = ExactRouteSelector(rail_network.connections)
+    exact.instrument(rail_network.instrumentation)
+    optimized_trajectories, report = exact.solve(trajectories, max_routes=args.max_routes, max_time=args.time_limit,
+                                                 node_limit=args.node_limit, time_limit=args.solver_time_limit)
+
+    print(f"Candidate trajectories: {report['candidates']}, after pruning: {report['pruned_candidates']}")
+    print(f"Branch-and-bound nodes: {report['nodes']} in {report['seconds']:.1f} seconds")
+    print(f"The K-score for branch-and-bound selection is: {report['K_score']}")
+    if report["optimal"]:
+        print("This K-score is optimal.")
+    else:
+        print(f"The search stopped early at the {report['stopped_by']}, this K-score is not proven to be optimal.")
+        print(f"Upper bound: {report['upper_bound']:.1f}, optimality gap: {report['gap']:.1f}")
+
+    print_trajectories(optimized_trajectories)
+    print_profile(rail_network)
+
+    return {"trajectories": optimized_trajectories, **report}
+
+def run_depth_climber(args):
+    """
+    Runs the Depth Climber for min_routes to max_routes routes and streams the K-score and trajectory
+    of every iteration to depthclimberdata in the chosen format.
+    """
+    depth_network = load_network(DepthClimberRailNetwork, args)
+    stations_file, connections_file = dataset_files(args)
+    random.seed(args.seed)
+
+    # Routes between all pairs of stations are searched once and read from the on-disk cache afterwards
+    if not args.sampling:
+        depth_network.route_cache = cached_route_table(depth_network, stations_file, connections_file)
+
+    # Setup Depth Climber experiment, or continue it from a checkpoint
+    checkpoint = open_checkpoint(args)
+    first_routes, real_highst_k, real_best_traject, full_k_scores, all_trajectories = resume_runs(checkpoint, depth_network, args.min_routes)
+
+    sink_position = checkpoint.state.get('sink') if checkpoint is not None else None
+    with open_result_sink(output_path(args, f'depthclimberdata{args.dataset}'), depth_network.station_names, args.format, position=sink_position) as sink:
+        if checkpoint is not None:
+            checkpoint.sink = sink
+
+        for i in range(first_routes, args.max_routes + 1):
+            if checkpoint is not None:
+                save_runs(checkpoint, depth_network, i, real_highst_k, real_best_traject, full_k_scores, all_trajectories)
+
+            # A run that continues from the checkpoint already has its trajectories
+            initial_trajectories = None
+            if checkpoint is None or checkpoint.resume('depth_climber') is None:
+                initial_trajectories = depth_network.generate_initial_trajectories(num_trajectories=i, sampling=args.sampling)
             best_trajectory, best_K_score, k_score_list, trajectory_list = depth_network.hill_climber_depth_first(
-                num_iterations=1, 
-                initial_trajectories=initial_trajectories
+                num_iterations=args.iterations,
+                initial_trajectories=initial_trajectories,
+                sampling=args.sampling,
+                record_trajectories=plots_enabled(args),
+                sink=sink,
+                checkpoint=checkpoint
             )
-        
-            for k_score, trajectory in zip(k_score_list, trajectory_list):
-                full_k_scores.append(k_score)
-                all_trajectories.append(trajectory)
-                
-                # Write to CSV
-                trajectory_str = ' -> '.join([str(station) for station in trajectory]) 
-                writer.writerow([k_score, trajectory_str])
+
+            # The first K-score belongs to the initial trajectory, which has no entry in trajectory_list
+            full_k_scores += k_score_list[1:]
+            all_trajectories += trajectory_list
 
             if best_K_score > real_highst_k:
                 real_highst_k = best_K_score
                 real_best_traject = best_trajectory
 
-    print("Highest K-Score:", real_highst_k)
-    print("Number of Routes used:", len(real_best_traject))
+    if checkpoint is not None:
+        checkpoint.remove()
+
+    real_highst_k = print_best_run(real_highst_k, real_best_traject)
+    print(f"Results of every iteration are saved in '{sink.path}'.")
+    print_profile(depth_network)
 
-    # Plot scores from saved CSV file
-    plot_scores_from_csv(csv_output_file)
-    
-    # Add new scatter plot with synchronized data
-    plot_trajectory_length_vs_score(full_k_scores, all_trajectories)
+    if plots_enabled(args):
+        # Plot the K-score distribution of the saved iterations and the trajectory lengths against their K-scores
+        visualizer(args).plot_k_score_distribution(full_k_scores, plot_path(args, "depth_climber_k_scores"))
+        visualizer(args).plot_trajectory_length_vs_score(full_k_scores, all_trajectories, plot_path(args, "depth_climber_lengths"))
 
-def run_random_baseline():
+    return {"K_score": real_highst_k, "trajectories": real_best_traject, "output": sink.path}
+
+def run_random_baseline(args):
     """
-    Run the random baseline algorithm, save results to a CSV, and plot the K-score distribution.
+    Run the random baseline algorithm, save every trajectory with its K-score, and plot the K-score distribution.
     """
-    # Parameters
-    time_limit = 180
-    num_trajectories = 260000
+    # Initialize the Random baseline, the batches run on the memory-mapped arrays of the cached compiled network
+    random_baseline = load_network(Baseline, args)
+    load_compiled_network(random_baseline, *dataset_files(args))
 
-    # Initialize the Random baseline
-    random_baseline = Baseline(max_time_limit=time_limit)
+    # Generate and score the trajectories in batches and write every trajectory with its own K-score
+    checkpoint = open_checkpoint(args)
+    K_scores = array('d')
+    if checkpoint is not None:
+        # The batches save the checkpoint, and with it the K-scores so far
+        K_scores = checkpoint.state.setdefault('K_scores', K_scores)
 
-    # Load stations and connections
-    random_baseline.load_stations("data/NL/StationsNationaal.csv")
-    random_baseline.load_connections("data/NL/ConnectiesNationaal.csv")
+    sink_position = checkpoint.state.get('sink') if checkpoint is not None else None
+    with open_result_sink(output_path(args, 'kscores_trajectories'), random_baseline.station_names, args.format, position=sink_position) as sink:
+        if checkpoint is not None:
+            checkpoint.sink = sink
+        if sink_position is None:
+            sink.new_run()
 
-    # Calculate K-scores for the trajectories
-    K_scores = random_baseline.calculate_kscore_trajectories(time_limit, num_trajectories)
+        for batch in random_baseline.iter_random_batches(args.time_limit, args.trajectories, args.batch_size, seed=args.seed, checkpoint=checkpoint):
+            batch_scores = batch.scores.tolist()
+            for trajectory_index in range(len(batch)):
+                sink.write(len(K_scores) + trajectory_index, batch_scores[trajectory_index], batch.trajectory(trajectory_index))
+            K_scores.extend(batch_scores)
 
-    # Write K-scores and trajectories to a CSV file
-    with open('kscores_trajectories.csv', mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(['K-Score', 'Trajectory'])  # CSV header
-
-        for trajectory_index in range(num_trajectories):
-            # Generate the trajectory and K-score
-            traject = random_baseline.generate_random_trajectory(time_limit)
-            K_score = K_scores[trajectory_index]
-            
-            # Convert the trajectory to a string format
-            trajectory_str = ' -> '.join(
-                ["['{}']".format("', '".join([station.name for station in route])) for route, total_time in traject]
-            )
-            
-            # Write the K-score and trajectory to the CSV file
-            writer.writerow([K_score, trajectory_str])
+    if checkpoint is not None:
+        checkpoint.remove()
 
-    print(f"{num_trajectories} random trajectories and K-scores have been successfully saved in 'kscores_trajectories.csv'.")
+    print(f"{args.trajectories} random trajectories and K-scores have been successfully saved in '{sink.path}'.")
+    highest_K = max(K_scores) if K_scores else None
+    print(f"Highest K-Score: {highest_K}")
+    print_profile(random_baseline)
 
     # Plot the K-score distribution
-    plot_k_score_distribution(K_scores)
-
-def main():
-    # Load data
-    stations_file = 'data/NL/StationsNationaal.csv'
-    connections_file = 'data/NL/ConnectiesNationaal.csv'
-
-    # Initialize RailNetwork and load data
-    rail_network = RailNetwork(180)
-    rail_network.load_stations(stations_file)
-    rail_network.load_connections(connections_file)
-
-    # Menu for user selection
-    print("Choose which algorithm to run:")
-    print("1. Greedy Algorithm")
-    print("2. Depth Climber Algorithm")
-    print("3. Random Baseline")
-    print("4. Hill Climber Random")
-    print("5. Run All")
-    choice = input("Enter your choice (1/2/3/4/5): ")
-
-    if choice == "1":
-        run_greedy(rail_network, stations_file, connections_file)
-    elif choice == "2":
-        run_depth_climber(stations_file, connections_file)
-    elif choice == "3":
-        run_random_baseline()
-    elif choice == "4":
-        run_hill_climber_random()
-    elif choice == "5":
-        run_greedy(rail_network, stations_file, connections_file)
-        run_depth_climber(stations_file, connections_file)
-        run_random_baseline()
-        run_hill_climber_random()
-    else:
-        print("Invalid choice. Please enter 1, 2, 3, 4, or 5.")
+    if plots_enabled(args):
+        visualizer(args).plot_k_score_distribution(K_scores, plot_path(args, "baseline_k_scores"))
 
-if __name__ == "__main__":
-    main()
+    return {"K_score": highest_K, "output": sink.path}
+
+def run_render(args):
+    """
+    Renders maps of the best solutions in a results file, and the K-score and duration plots of all its iterations, to <output-dir>/plots.
+    """
+    rail_network = load_network(RailNetwork, args)
+    args.show_plots = False
+    paths = visualizer(args).render_results(rail_network, args.results, output_path(args, "plots"), best=args.best, basemap=args.basemap)
+    print(f"Rendered {len(paths)} plots to '{output_path(args, 'plots')}'.")
+    return {"output": paths}
+
+def run_all(args):
+    """
+    Runs the greedy selection, the Depth Climber, the random baseline and the Hill Climber with their default settings.
+    """
+    results = {}
+    for command in ("greedy", "depth-climber", "baseline", "hill-climber"):
+        print(f"--- {command} ---")
+        command_args = parse_args([command] + common_argv(args))
+        results[command] = COMMANDS[command](command_args)
+    K_scores = [result["K_score"] for result in results.values() if result["K_score"] is not None]
+    return {"K_score": max(K_scores, default=None), "runs": results}
+
+def common_argv(args):
+    """
+    Returns the options shared by every subcommand as command line arguments.
+    """
+    argv = ["--dataset", args.dataset, "--seed", str(args.seed), "--output-dir", args.output_dir, "--format", args.format]
+    if args.stations_file:
+        argv += ["--stations-file", args.stations_file]
+    if args.connections_file:
+        argv += ["--connections-file", args.connections_file]
+    if args.time_limit_set:
+        argv += ["--time-limit", str(args.time_limit)]
+    if args.max_routes_set:
+        argv += ["--max-routes", str(args.max_routes)]
+    if args.show_plots:
+        argv.append("--show-plots")
+    if args.save_plots:
+        argv.append("--save-plots")
+    if not args.basemap:
+        argv.append("--no-basemap")
+    return argv
+
+def expand_sweep(config):
+    """
+    Returns the runs of a sweep config as lists of command line arguments.
+
+    The config is a JSON object with optional "defaults" and a list of "runs". Every run names its
+    "algorithm" (a subcommand) and options by their long name, for example {"algorithm": "hill-climber",
+    "iterations": 5000, "seed": [0, 1, 2]}. A list of values runs every combination of the listed values.
+    True adds a flag, false or null leaves an option out.
+    """
+    defaults = config.get("defaults", {})
+    argv_list = []
+    for run in config["runs"]:
+        options = {**defaults, **run}
+        algorithm = options.pop("algorithm")
+        names = list(options)
+        values = [value if isinstance(value, list) else [value] for value in options.values()]
+
+        for combination in itertools.product(*values):
+            argv = [algorithm]
+            for name, value in zip(names, combination):
+                option = "--" + name.replace("_", "-")
+                if value is True:
+                    argv.append(option)
+                elif value is not False and value is not None:
+                    argv += [option, str(value)]
+            argv_list.append(argv)
+    return argv_list
+
+def run_sweep(args):
+    """
+    Runs every combination of a sweep config, each in its own output directory,
+    and writes the K-score and settings of every run to sweep_results.json.
+    """
+    with open(args.config) as file:
+        argv_list = expand_sweep(json.load(file))
+
+    # Every run is checked before the first one starts
+    runs = [parse_args(argv) for argv in argv_list]
+    if args.dry_run:
+        for argv in argv_list:
+            print("python main.py " + " ".join(argv))
+        return {"runs": argv_list}
+
+    summary = []
+    for index, run_args in enumerate(runs):
+        # Runs share the sweep output directory unless their config sets one
+        if not run_args.output_dir_set:
+            run_args.output_dir = os.path.join(args.output_dir, f"run-{index:03d}-{run_args.command}")
+        print(f"=== Run {index + 1}/{len(runs)}: {' '.join(argv_list[index])} ===")
+
+        start = time.perf_counter()
+        result = COMMANDS[run_args.command](run_args)
+        summary.append({
+            "argv": argv_list[index],
+            "output_dir": run_args.output_dir,
+            "K_score": result.get("K_score"),
+            "seconds": time.perf_counter() - start,
+        })
+
+        # Written after every run, so a sweep that is stopped keeps the finished runs
+        with open(output_path(args, "sweep_results.json"), 'w') as file:
+            json.dump(summary, file, indent=2)
 
+    return {"runs": summary}
 
+def run_serve(args):
+    """
+    Runs the experiment service until it is stopped with Ctrl+C, see service.py.
+    """
+    import asyncio
+    import service
+
+    experiment_service = service.ExperimentService(args.state_dir, args.workers)
+    if args.config:
+        with open(args.config) as file:
+            experiment_service.submit_config(json.load(file))
+    try:
+        asyncio.run(experiment_service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"Stopped, unfinished jobs continue when the service is started again with state in '{args.state_dir}'.")
+    return {"jobs": list(experiment_service.jobs.values())}
+
+def run_submit(args):
+    """
+    Submits a job to a running experiment service.
+    """
+    import service
+    answer = service.request(f"{args.url}/jobs", "POST", {"argv": args.job})
+    print(json.dumps(answer, indent=2))
+    return answer
+
+def run_status(args):
+    """
+    Prints the status of all jobs or of a single job of a running experiment service.
+    """
+    import service
+    if args.job_id:
+        answer = service.request(f"{args.url}/jobs/{args.job_id}")
+        print(json.dumps(answer, indent=2))
+        return answer
+
+    answer = service.request(f"{args.url}/jobs")
+    if "jobs" not in answer:
+        print(json.dumps(answer, indent=2))
+        return answer
+    for job in answer["jobs"]:
+        K_score = job["result"]["K_score"] if job["result"] else ""
+        print(f"{job['id']}  {job['status']:<10}{K_score!s:<22}{' '.join(job['argv'])}")
+    print(", ".join(f"{count} {status}" for status, count in answer["counts"].items()))
+    return answer
+
+COMMANDS = {
+    "greedy": run_greedy,
+    "exact": run_exact,
+    "depth-climber": run_depth_climber,
+    "baseline": run_random_baseline,
+    "hill-climber": run_hill_climber_random,
+    "parallel": run_hill_climber_parallel,
+    "all": run_all,
+    "sweep": run_sweep,
+    "render": run_render,
+    "serve": run_serve,
+    "submit": run_submit,
+    "status": run_status,
+}
+
+# Default smallest amount of routes of the subcommands that run every amount up to --max-routes
+MIN_ROUTES = {"depth-climber": 2, "hill-climber": 8, "parallel": 8}
+
+# Subcommands without the common options
+SERVICE_COMMANDS = ("sweep", "serve", "submit", "status")
+
+class StoreSet(argparse.Action):
+    """
+    Stores an option and remembers that it was given, so dataset defaults and sweep directories are not applied over it.
+    """
+    def __call__(self, parser, namespace, values, option_string=None):
+        setattr(namespace, self.dest, values)
+        setattr(namespace, self.dest + "_set", True)
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--dataset", choices=list(DATASETS), default="NL", help="network to run on (default: NL)")
+    common.add_argument("--stations-file", help="custom stations csv, for example a synthetic network")
+    common.add_argument("--connections-file", help="custom connections csv")
+    common.add_argument("--time-limit", type=int, action=StoreSet, help="maximum minutes per trajectory (default: 180 for NL, 120 for NZ-Holland)")
+    common.add_argument("--max-routes", type=int, action=StoreSet, help="maximum amount of trajectories (default: 20 for NL, 7 for NZ-Holland)")
+    common.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    common.add_argument("--output-dir", default=".", action=StoreSet, help="directory for the result files (default: current directory)")
+    common.add_argument("--format", choices=RESULT_FORMATS, default="npy", help="format of the iteration results (default: npy)")
+    common.add_argument("--save-plots", action="store_true", help="save the plots as png files in <output-dir>/plots, without a display")
+    common.add_argument("--show-plots", action="store_true", help="show the plots in matplotlib windows")
+    common.add_argument("--no-basemap", dest="basemap", action="store_false", help="draw maps on a plain canvas instead of OpenStreetMap tiles")
+    common.add_argument("--profile", metavar="FILE", help="profile the run with cProfile, write the profile to FILE and print a summary")
+    common.add_argument("--progress", metavar="FILE", help="append every improvement and run event to FILE as JSON lines")
+    common.add_argument("--verbose", action="store_true", help="print every improvement")
+
+    # Options of the optimizers that can continue from a checkpoint
+    checkpointing = argparse.ArgumentParser(add_help=False)
+    checkpointing.add_argument("--checkpoint", metavar="FILE", help="save the state of the run to FILE regularly, removed when the run finishes")
+    checkpointing.add_argument("--resume", action="store_true", help="continue from the --checkpoint file if it exists, with the same settings")
+    checkpointing.add_argument("--checkpoint-interval", type=float, default=60, help="seconds between checkpoints (default: 60)")
+
+    parser = argparse.ArgumentParser(description="Run the rail network experiments.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    greedy = subparsers.add_parser("greedy", parents=[common], help="greedy selection from all possible trajectories")
+    greedy.add_argument("--lazy", action="store_true", help="select on K-score gain with a lazy priority queue")
+    greedy.add_argument("--bounded", action="store_true", help="select on K-score gain with routes from a branch-and-bound search, without enumerating")
+    greedy.add_argument("--max-stations", type=int, default=100, help="maximum stations per trajectory (default: 100)")
+
+    exact = subparsers.add_parser("exact", parents=[common], help="branch-and-bound selection, optimal unless a limit stops it early, otherwise with an optimality gap")
+    exact.add_argument("--max-stations", type=int, default=100, help="maximum stations per trajectory (default: 100)")
+    exact.add_argument("--solver-time-limit", type=float, default=300, help="seconds before the search stops (default: 300)")
+    exact.add_argument("--node-limit", type=int, help="branch-and-bound nodes before the search stops")
+
+    depth = subparsers.add_parser("depth-climber", parents=[common, checkpointing], help="hill climber over depth-first routes")
+    depth.add_argument("--iterations", type=int, default=1, help="iterations per amount of routes (default: 1)")
+    depth.add_argument("--min-routes", type=int, help="smallest amount of routes (default: 2, at most --max-routes)")
+    depth.add_argument("--sampling", action="store_true", help="sample routes instead of enumerating all routes between two stations")
+
+    baseline = subparsers.add_parser("baseline", parents=[common, checkpointing], help="random trajectories as a baseline")
+    baseline.add_argument("--trajectories", type=int, default=260000, help="amount of random trajectories (default: 260000)")
+    baseline.add_argument("--batch-size", type=int, default=10000, help="trajectories generated at once (default: 10000)")
+
+    hill_climber = subparsers.add_parser("hill-climber", parents=[common, checkpointing], help="hill climber with random route swaps")
+    hill_climber.add_argument("--iterations", type=int, default=20000, help="iterations per amount of routes (default: 20000)")
+    hill_climber.add_argument("--min-routes", type=int, help="smallest amount of routes (default: 8, at most --max-routes)")
+    hill_climber.add_argument("--moves", action="store_true", help="also extend, trim, reroute, merge, split and delete routes")
+
+    parallel = subparsers.add_parser("parallel", parents=[common], help="hill climber with restarts on all cores")
+    parallel.add_argument("--iterations", type=int, default=20000, help="iterations per run (default: 20000)")
+    parallel.add_argument("--min-routes", type=int, help="smallest amount of routes (default: 8, at most --max-routes)")
+    parallel.add_argument("--restarts", type=int, default=4, help="runs per amount of routes (default: 4)")
+    parallel.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+
+    subparsers.add_parser("all", parents=[common], help="greedy, depth climber, baseline and hill climber")
+
+    render = subparsers.add_parser("render", parents=[common], help="render the best solutions of a results file to png files")
+    render.add_argument("results", help="results file or directory written with --format")
+    render.add_argument("--best", type=int, default=10, help="amount of best solutions to render (default: 10)")
+
+    sweep = subparsers.add_parser("sweep", help="run every combination of a JSON sweep config")
+    sweep.add_argument("config", help="JSON file with the runs, see expand_sweep")
+    sweep.add_argument("--output-dir", default="sweep", help="directory for the runs and sweep_results.json (default: sweep)")
+    sweep.add_argument("--dry-run", action="store_true", help="only print the runs")
+
+    url = "http://127.0.0.1:8765"
+    serve = subparsers.add_parser("serve", help="run jobs from a queue on worker processes, with their status on a local HTTP endpoint")
+    serve.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    serve.add_argument("--port", type=int, default=8765, help="port to listen on (default: 8765)")
+    serve.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    serve.add_argument("--state-dir", default="experiments", help="directory for the jobs and their results (default: experiments)")
+    serve.add_argument("--config", help="JSON sweep config with jobs to submit at the start")
+
+    submit = subparsers.add_parser("submit", help="submit a job to a running service, for example: submit hill-climber --seed 3")
+    submit.add_argument("--url", default=url, help=f"address of the service (default: {url})")
+    submit.add_argument("job", nargs=argparse.REMAINDER, help="subcommand and options of the job")
+
+    status = subparsers.add_parser("status", help="show the jobs of a running service")
+    status.add_argument("job_id", nargs="?", help="show a single job with its last progress event")
+    status.add_argument("--url", default=url, help=f"address of the service (default: {url})")
+
+    parser.set_defaults(time_limit_set=False, max_routes_set=False, output_dir_set=False, checkpoint=None)
+    return parser
+
+def parse_args(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command in SERVICE_COMMANDS:
+        return args
+
+    # Limits that are not given follow the dataset
+    _, _, time_limit, max_routes = DATASETS[args.dataset]
+    if args.time_limit is None:
+        args.time_limit = time_limit
+    if args.max_routes is None:
+        args.max_routes = max_routes
+
+    if args.command in MIN_ROUTES:
+        if args.min_routes is None:
+            args.min_routes = min(MIN_ROUTES[args.command], args.max_routes)
+        if args.min_routes > args.max_routes:
+            parser.error(f"--min-routes {args.min_routes} is larger than --max-routes {args.max_routes}")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    COMMANDS[args.command](args)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,332 @@
+"""
+Local experiment service: runs many experiments of main.py at the same time on a pool of worker processes.
+
+A job is the command line of a single main.py run, for example ["hill-climber", "--dataset", "NL", "--seed", "3"].
+Jobs wait in a queue and are dispatched to the worker processes by an asyncio event loop, which also
+serves the status of every job as JSON over HTTP on localhost:
+
+    GET  /jobs              all jobs
+    GET  /jobs/<id>         one job, with the last progress event of a running job
+    POST /jobs              submit jobs, {"argv": [...]} or a sweep config like main.py sweep uses
+    POST /jobs/<id>/cancel  cancel a job that has not started
+
+Every job writes its results, its printed output (output.log) and its progress events (progress.jsonl)
+to its own directory in the state directory. The state of all jobs is saved to jobs.json after every change,
+so a service that is stopped continues with the unfinished jobs when it is started again. Hill climber,
+depth climber and baseline jobs also save a checkpoint, and continue from it instead of starting over.
+
+Start it with `python main.py serve`, and submit jobs with `python main.py submit hill-climber --seed 3`.
+"""
+import asyncio
+import contextlib
+import http.client
+import io
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+import main
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Subcommands that run a single experiment and can be a job
+JOB_COMMANDS = ("greedy", "exact", "depth-climber", "baseline", "hill-climber", "parallel")
+
+# Subcommands that save checkpoints, a job that is queued again continues from its checkpoint
+CHECKPOINT_COMMANDS = ("depth-climber", "baseline", "hill-climber")
+
+HTTP_STATUS = {
+    200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+    500: "Internal Server Error",
+}
+
+def run_job(argv, job_dir):
+    """
+    Run a job in a worker process. Output goes to the job directory, and the K-score and result
+    paths are returned.
+    """
+    os.makedirs(job_dir, exist_ok=True)
+    argv = argv + ["--output-dir", job_dir, "--progress", os.path.join(job_dir, "progress.jsonl")]
+    if argv[0] in CHECKPOINT_COMMANDS:
+        argv += ["--checkpoint", os.path.join(job_dir, "checkpoint.pickle"), "--resume"]
+    if argv[0] == "parallel":
+        # The job already has a worker of the service, a pool over all cores in every worker would oversubscribe them
+        argv += ["--workers", "1"]
+    args = main.parse_args(argv)
+
+    with open(os.path.join(job_dir, "output.log"), 'a') as log, contextlib.redirect_stdout(log):
+        result = main.COMMANDS[args.command](args)
+
+    return {"K_score": result.get("K_score"), "output": result.get("output")}
+
+def check_argv(argv):
+    """
+    Raises ValueError if argv is not a valid command line of a job.
+    """
+    if not isinstance(argv, list) or not all(isinstance(argument, str) for argument in argv):
+        raise ValueError("argv has to be a list of strings")
+    if not argv or argv[0] not in JOB_COMMANDS:
+        raise ValueError(f"A job runs one of {', '.join(JOB_COMMANDS)}")
+    if "-h" in argv or "--help" in argv:
+        raise ValueError("A job cannot ask for help, see python main.py <subcommand> --help")
+
+    # argparse prints its error and exits, the error is sent back instead
+    errors = io.StringIO()
+    try:
+        with contextlib.redirect_stderr(errors), contextlib.redirect_stdout(io.StringIO()):
+            main.parse_args(argv)
+    except SystemExit:
+        lines = errors.getvalue().strip().splitlines()
+        raise ValueError(lines[-1] if lines else f"Invalid arguments: {' '.join(argv)}")
+
+def last_event(progress_path):
+    """
+    Returns the last event in a progress file, or None.
+    """
+    try:
+        with open(progress_path, 'rb') as file:
+            file.seek(0, os.SEEK_END)
+            file.seek(max(0, file.tell() - 4096))
+            lines = file.read().splitlines()
+    except FileNotFoundError:
+        return None
+    for line in reversed(lines):
+        try:
+            return json.loads(line)
+        except ValueError:
+            continue
+    return None
+
+class ExperimentService:
+    """
+    Job queue with an asyncio front end and a pool of worker processes.
+
+    Jobs are dicts with an id, the argv of the run, a status (queued, running, done, failed or cancelled),
+    timestamps and the result or error. They are kept in submission order and saved to state_dir/jobs.json.
+    """
+    def __init__(self, state_dir="experiments", workers=None):
+        self.state_dir = state_dir
+        self.workers = workers or os.cpu_count()
+        self.jobs = {}
+        self.queue = None
+        self.pool = None
+        os.makedirs(state_dir, exist_ok=True)
+        self.load()
+
+    @property
+    def jobs_path(self):
+        return os.path.join(self.state_dir, "jobs.json")
+
+    def load(self):
+        """
+        Load the jobs of an earlier service. Jobs that were running when it stopped are queued again.
+        """
+        if not os.path.exists(self.jobs_path):
+            return
+        with open(self.jobs_path) as file:
+            for job in json.load(file):
+                if job["status"] == "running":
+                    job["status"] = "queued"
+                    job["started"] = None
+                self.jobs[job["id"]] = job
+
+    def save(self):
+        """
+        Write the jobs to jobs.json. The file is replaced at once, so it is never half written.
+        """
+        temporary_path = self.jobs_path + ".tmp"
+        with open(temporary_path, 'w') as file:
+            json.dump(list(self.jobs.values()), file, indent=2)
+        os.replace(temporary_path, self.jobs_path)
+
+    def submit(self, argv):
+        """
+        Add a job for a main.py command line and return it. Raises ValueError for an invalid command line.
+        """
+        check_argv(argv)
+
+        job_id = f"job-{len(self.jobs):04d}"
+        job = {
+            "id": job_id,
+            "argv": list(argv),
+            "status": "queued",
+            "submitted": time.time(),
+            "started": None,
+            "finished": None,
+            "result": None,
+            "error": None,
+            "directory": os.path.join(self.state_dir, job_id),
+        }
+        self.jobs[job_id] = job
+        self.save()
+        if self.queue is not None:
+            self.queue.put_nowait(job_id)
+        return job
+
+    def submit_config(self, config):
+        """
+        Add a job for every run of a sweep config (see main.expand_sweep) and return them.
+        """
+        try:
+            argv_list = main.expand_sweep(config)
+        except (AttributeError, KeyError, TypeError) as e:
+            raise ValueError(f"Invalid sweep config: {type(e).__name__}: {e}")
+
+        # All runs are checked before any of them is queued
+        for argv in argv_list:
+            check_argv(argv)
+        return [self.submit(argv) for argv in argv_list]
+
+    def cancel(self, job_id):
+        job = self.jobs[job_id]
+        if job["status"] != "queued":
+            raise ValueError(f"Job {job_id} is {job['status']}, only queued jobs can be cancelled")
+        job["status"] = "cancelled"
+        job["finished"] = time.time()
+        self.save()
+        return job
+
+    def status(self, job_id=None):
+        """
+        Returns all jobs, or one job with the last progress event if it is running.
+        """
+        if job_id is None:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return {"workers": self.workers, "counts": counts, "jobs": list(self.jobs.values())}
+
+        job = dict(self.jobs[job_id])
+        if job["status"] == "running":
+            job["progress"] = last_event(os.path.join(job["directory"], "progress.jsonl"))
+        return job
+
+    async def worker(self):
+        """
+        Take jobs from the queue and run them in the process pool, one at a time.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            job_id = await self.queue.get()
+            job = self.jobs[job_id]
+            if job["status"] != "queued":
+                continue
+
+            job["status"] = "running"
+            job["started"] = time.time()
+            self.save()
+            try:
+                job["result"] = await loop.run_in_executor(self.pool, run_job, job["argv"], job["directory"])
+                job["status"] = "done"
+            except Exception as e:
+                job["error"] = f"{type(e).__name__}: {e}"
+                job["status"] = "failed"
+            job["finished"] = time.time()
+            self.save()
+
+    async def handle_request(self, reader, writer):
+        """
+        Answer a single HTTP request with JSON.
+        """
+        try:
+            request_line = (await reader.readline()).decode().split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode().strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+            if len(request_line) < 2:
+                status, payload = 400, {"error": "Invalid request"}
+            else:
+                status, payload = self.route(request_line[0], request_line[1], body)
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            status, payload = 400, {"error": str(e)}
+        except Exception as e:
+            # The client always gets an answer, and the service keeps running
+            status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+        data = json.dumps(payload, indent=2).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {HTTP_STATUS[status]}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data
+        )
+        await writer.drain()
+        writer.close()
+
+    def route(self, method, path, body):
+        """
+        Returns the HTTP status and JSON payload for a request.
+        """
+        parts = [part for part in path.split("/") if part]
+        if not parts or parts[0] != "jobs":
+            return 404, {"error": f"Unknown path {path}"}
+
+        if len(parts) == 1:
+            if method == "GET":
+                return 200, self.status()
+            if method == "POST":
+                request = json.loads(body or b"{}")
+                if not isinstance(request, dict):
+                    return 400, {"error": "Send a JSON object with argv or a sweep config"}
+                try:
+                    jobs = [self.submit(request["argv"])] if "argv" in request else self.submit_config(request)
+                except ValueError as e:
+                    return 400, {"error": str(e)}
+                return 201, {"jobs": jobs}
+            return 405, {"error": f"{method} is not supported on {path}"}
+
+        job_id = parts[1]
+        if job_id not in self.jobs:
+            return 404, {"error": f"Unknown job {job_id}"}
+        if len(parts) == 2 and method == "GET":
+            return 200, self.status(job_id)
+        if len(parts) == 3 and parts[2] == "cancel" and method == "POST":
+            try:
+                return 200, self.cancel(job_id)
+            except ValueError as e:
+                return 409, {"error": str(e)}
+        return 405, {"error": f"{method} is not supported on {path}"}
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """
+        Run the queue, the workers and the HTTP endpoint until the service is stopped.
+        """
+        self.queue = asyncio.Queue()
+        for job_id, job in self.jobs.items():
+            if job["status"] == "queued":
+                self.queue.put_nowait(job_id)
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            self.pool = pool
+            workers = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+            server = await asyncio.start_server(self.handle_request, host, port)
+            print(f"Experiment service on http://{host}:{port}/jobs with {self.workers} workers, state in '{self.state_dir}'")
+            try:
+                async with server:
+                    await server.serve_forever()
+            finally:
+                for task in workers:
+                    task.cancel()
+
+def request(url, method="GET", payload=None):
+    """
+    Send a request to a running service and return the JSON answer.
+    """
+    data = json.dumps(payload).encode() if payload is not None else None
+    http_request = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(http_request) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        return json.load(e)
+    except urllib.error.URLError as e:
+        return {"error": f"No experiment service at {url}: {e.reason}"}
+    except (http.client.HTTPException, ConnectionError) as e:
+        return {"error": f"No answer from the experiment service at {url}: {type(e).__name__}: {e}"}
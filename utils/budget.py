@@ -0,0 +1,42 @@
+import time
+
+class SearchBudget:
+    """
+    Iteration and CPU time budget of an optimization run.
+
+    The run stops as soon as either num_iterations iterations are done or time_budget CPU seconds
+    have passed; a limit that is None is not checked. At least one of the two has to be set.
+    elapsed is the CPU time already used, for a run that continues from a checkpoint.
+    """
+    def __init__(self, num_iterations=None, time_budget=None, elapsed=0):
+        if num_iterations is None and time_budget is None:
+            raise ValueError("Set num_iterations, time_budget or both.")
+
+        self.num_iterations = num_iterations
+        self.time_budget = time_budget
+        self.start_time = time.process_time() - elapsed
+
+    def elapsed(self):
+        """
+        Returns the CPU seconds since the budget was created.
+        """
+        return time.process_time() - self.start_time
+
+    def exhausted(self, iteration):
+        """
+        Returns whether the run has to stop before the given iteration.
+        """
+        if self.num_iterations is not None and iteration >= self.num_iterations:
+            return True
+        return self.time_budget is not None and self.elapsed() >= self.time_budget
+
+    def progress(self, iteration):
+        """
+        Returns the fraction of the budget that is used, between 0 and 1.
+        """
+        progress = 0
+        if self.num_iterations:
+            progress = iteration / self.num_iterations
+        if self.time_budget:
+            progress = max(progress, self.elapsed() / self.time_budget)
+        return min(progress, 1)
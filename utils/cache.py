@@ -0,0 +1,284 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from array import array
+import numpy as np
+from classes.compiled_network import CompiledNetwork
+from classes.rail_network import RailNetwork
+from utils.helper import iter_trajectories
+
+DEFAULT_CACHE_DIR = ".cache"
+
+def cache_key(files, **params):
+    """
+    Returns a key for a cached artifact from the contents of its input files and its parameters.
+    """
+    digest = hashlib.sha256()
+    for filepath in files:
+        with open(filepath, 'rb') as file:
+            digest.update(hashlib.sha256(file.read()).digest())
+    for name in sorted(params):
+        digest.update(f"{name}={params[name]!r};".encode())
+    return digest.hexdigest()[:24]
+
+class ArtifactCache:
+    """
+    Directory of cached artifacts, each stored as a directory of NumPy .npy files.
+    Arrays are loaded memory-mapped, so processes that load the same artifact share its pages.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def path(self, kind, key):
+        return os.path.join(self.cache_dir, f"{kind}-{key}")
+
+    def save(self, kind, key, arrays):
+        """
+        Store a dict of arrays. The files are written to a temporary directory first,
+        so readers never see a partly written artifact.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        directory = tempfile.mkdtemp(dir=self.cache_dir)
+        for name, values in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), values)
+
+        try:
+            os.rename(directory, self.path(kind, key))
+        except OSError:
+            # Another process stored the same artifact first
+            shutil.rmtree(directory)
+
+    def load(self, kind, key, mmap=True):
+        """
+        Returns the dict of arrays of an artifact, or None if it is not cached.
+        """
+        path = self.path(kind, key)
+        if not os.path.isdir(path):
+            return None
+
+        return {
+            filename[:-len(".npy")]: np.load(os.path.join(path, filename), mmap_mode='r' if mmap else None)
+            for filename in os.listdir(path)
+            if filename.endswith(".npy")
+        }
+
+def compiled_network_arrays(compiled):
+    return {name: getattr(compiled, name) for name in ('x', 'y', 'offsets', 'neighbors', 'weights', 'edge_ids', 'edge_stations', 'edge_weights')} | {
+        'station_names': np.array(compiled.station_names),
+    }
+
+def cached_compiled_network(stations_file, connections_file, network=None, cache=None):
+    """
+    Returns the compiled network of a dataset from the cache, with memory-mapped arrays. If it is not
+    cached yet it is compiled from the loaded RailNetwork network, or from the dataset files, and stored.
+    """
+    cache = cache or ArtifactCache()
+    key = cache_key([stations_file, connections_file])
+
+    arrays = cache.load('network', key)
+    if arrays is None:
+        if network is None:
+            network = RailNetwork()
+            network.load_stations(stations_file)
+            network.load_connections(connections_file)
+        cache.save('network', key, compiled_network_arrays(network.compile()))
+        arrays = cache.load('network', key)
+
+    return CompiledNetwork.from_arrays(arrays)
+
+def load_compiled_network(network, stations_file, connections_file, cache=None):
+    """
+    Returns the compiled network of a loaded RailNetwork from the cache, compiling and storing it if needed.
+    """
+    network.compiled_network = cached_compiled_network(stations_file, connections_file, network, cache)
+    return network.compiled_network
+
+class TrajectoryPool:
+    """
+    Read-only pool of trajectories stored as flat arrays: the station IDs of trajectory i are
+    stations[offsets[i]:offsets[i + 1]], its time is times[i] and masks[i] holds the bits of its
+    connections in 64-bit words.
+    Iterating gives (route, total_time) tuples of station names, like utils.helper.iter_trajectories.
+    """
+    block_size = 65536
+
+    def __init__(self, station_names, stations, offsets, times, masks):
+        self.station_names = list(station_names)
+        self.stations = stations
+        self.offsets = offsets
+        self.times = times
+        self.masks = masks
+
+    def __len__(self):
+        return len(self.times)
+
+    def __getitem__(self, index):
+        route = self.stations[self.offsets[index]:self.offsets[index + 1]].tolist()
+        return tuple(map(self.station_names.__getitem__, route)), int(self.times[index])
+
+    def __iter__(self):
+        for route, total_time, _ in self.iter_masks():
+            yield route, total_time
+
+    def iter_masks(self):
+        """
+        Yields (route, total_time, mask) for every trajectory, with mask the integer bitmask of
+        its connections over edge IDs, as utils.coverage.path_mask computes it.
+        """
+        station_names = self.station_names
+        offsets = self.offsets.tolist()
+        times = self.times.tolist()
+        mask_bytes = self.masks.shape[1] * 8
+
+        # Convert in blocks, converting one array element at a time is slow
+        for block_start in range(0, len(times), self.block_size):
+            block_end = min(block_start + self.block_size, len(times))
+            base = offsets[block_start]
+            names = list(map(station_names.__getitem__, self.stations[base:offsets[block_end]].tolist()))
+            masks = self.masks[block_start:block_end].tobytes()
+            for index in range(block_start, block_end):
+                mask_start = (index - block_start) * mask_bytes
+                mask = int.from_bytes(masks[mask_start:mask_start + mask_bytes], 'little')
+                yield tuple(names[offsets[index] - base:offsets[index + 1] - base]), times[index], mask
+
+def trajectory_masks(network, stations, offsets):
+    """
+    Returns the connections of flattened trajectories as an array with a row of 64-bit words per trajectory.
+    """
+    num_words = max(1, (len(network.connections) + 63) // 64)
+    if len(offsets) == 1:
+        return np.zeros((0, num_words), dtype=np.uint64)
+
+    # Edge IDs by station ID pair, a later parallel connection wins like in build_edge_index
+    num_stations = len(network.station_names)
+    edge_index = {}
+    for station, connections in enumerate(network.adjacency):
+        for neighbor, _, edge_id in connections:
+            edge_index[station * num_stations + neighbor] = edge_id
+    pair_keys = np.array(sorted(edge_index), dtype=np.int64)
+    pair_edges = np.array([edge_index[key] for key in pair_keys.tolist()], dtype=np.int64)
+
+    # Every trajectory has at least one step between two stations, steps across two trajectories are skipped
+    steps = np.ones(len(stations) - 1, dtype=bool)
+    steps[offsets[1:-1] - 1] = False
+    step_keys = stations[:-1][steps].astype(np.int64) * num_stations + stations[1:][steps]
+    edges = pair_edges[np.searchsorted(pair_keys, step_keys)]
+
+    step_masks = np.zeros((len(edges), num_words), dtype=np.uint64)
+    step_masks[np.arange(len(edges)), edges // 64] = np.left_shift(np.uint64(1), (edges % 64).astype(np.uint64))
+    first_steps = offsets[:-1] - np.arange(len(offsets) - 1)
+    masks = np.bitwise_or.reduceat(step_masks, first_steps, axis=0)
+    return masks
+
+def cached_trajectories(network, stations_file, connections_file, max_duration, max_stations, max_reuse=1, canonical=False, cache=None):
+    """
+    Returns the trajectories of utils.helper.iter_trajectories as a TrajectoryPool,
+    enumerating and storing them only if they are not cached yet.
+    """
+    cache = cache or ArtifactCache()
+    key = cache_key([stations_file, connections_file], max_duration=max_duration, max_stations=max_stations, max_reuse=max_reuse, canonical=canonical)
+
+    arrays = cache.load('trajectories', key)
+    if arrays is None:
+        stations = array('i')
+        offsets = array('q', [0])
+        times = array('i')
+        for route, total_time in iter_trajectories(network, max_duration, max_stations, max_reuse, canonical=canonical):
+            stations.extend(network.station_ids[station] for station in route)
+            offsets.append(len(stations))
+            times.append(total_time)
+
+        stations = np.frombuffer(stations, dtype=np.int32)
+        offsets = np.frombuffer(offsets, dtype=np.int64)
+        cache.save('trajectories', key, {
+            'stations': stations,
+            'offsets': offsets,
+            'times': np.frombuffer(times, dtype=np.int32),
+            'masks': trajectory_masks(network, stations, offsets),
+        })
+        arrays = cache.load('trajectories', key)
+
+    return TrajectoryPool(network.station_names, arrays['stations'], arrays['offsets'], arrays['times'], arrays['masks'])
+
+class MappedRoutes:
+    """
+    Read-only sequence of the routes between one pair of stations, as tuples of station IDs.
+    """
+    def __init__(self, stations, offsets):
+        self.stations = stations
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("route index out of range")
+        return tuple(self.stations[self.offsets[index]:self.offsets[index + 1]].tolist())
+
+class RouteTable:
+    """
+    Routes between all pairs of stations for one time limit, stored as flat arrays.
+    Has the get/put interface of utils.route_cache.RouteCache, so it can replace the route cache of
+    a DepthFirstRailNetwork. Routes for other time limits are not in the table.
+    """
+    def __init__(self, time_limit, num_stations, pair_offsets, route_offsets, stations):
+        self.time_limit = time_limit
+        self.num_stations = num_stations
+        self.pair_offsets = pair_offsets
+        self.route_offsets = route_offsets
+        self.stations = stations
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self.num_stations * self.num_stations
+
+    def get(self, key):
+        start_station, end_station, time_limit = key
+        if time_limit != self.time_limit:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        pair = start_station * self.num_stations + end_station
+        first, last = int(self.pair_offsets[pair]), int(self.pair_offsets[pair + 1])
+        return MappedRoutes(self.stations, self.route_offsets[first:last + 1])
+
+    def put(self, key, routes):
+        # The table is read-only, routes for other time limits are not stored
+        pass
+
+def cached_route_table(depth_network, stations_file, connections_file, time_limit=None, cache=None):
+    """
+    Returns the routes between all pairs of stations of a DepthFirstRailNetwork as a RouteTable,
+    computing and storing them only if they are not cached yet.
+    """
+    cache = cache or ArtifactCache()
+    time_limit = time_limit if time_limit is not None else depth_network.max_time_limit
+    key = cache_key([stations_file, connections_file], time_limit=time_limit)
+    num_stations = len(depth_network.station_names)
+
+    arrays = cache.load('routes', key)
+    if arrays is None:
+        pair_offsets = array('q', [0])
+        route_offsets = array('q', [0])
+        stations = array('i')
+        for routes_by_end in depth_network.iter_routes_by_start(time_limit):
+            for routes in routes_by_end:
+                for route in routes:
+                    stations.extend(route)
+                    route_offsets.append(len(stations))
+                pair_offsets.append(len(route_offsets) - 1)
+
+        cache.save('routes', key, {
+            'pair_offsets': np.frombuffer(pair_offsets, dtype=np.int64),
+            'route_offsets': np.frombuffer(route_offsets, dtype=np.int64),
+            'stations': np.frombuffer(stations, dtype=np.int32),
+        })
+        arrays = cache.load('routes', key)
+
+    return RouteTable(time_limit, num_stations, arrays['pair_offsets'], arrays['route_offsets'], arrays['stations'])
@@ -0,0 +1,71 @@
+import os
+import pickle
+import time
+
+class Checkpoint:
+    """
+    Periodic checkpoint of a long run, written as a single pickle file.
+
+    The state is a dict in which every part of a run keeps its own entry: main.py the results of the
+    finished optimizer runs, an optimizer the best solution, random state and iteration of the current
+    run. An optimizer checks due in its loop and saves its entry when a checkpoint is due, and takes
+    its entry back with resume when it starts, so a loaded checkpoint continues where the run stopped.
+
+    With a result sink (utils.results) the sink is flushed before every save and its position is saved
+    along, so a resumed run continues the result file at the same record.
+    """
+    def __init__(self, path, interval=60, state=None):
+        self.path = path
+        self.interval = interval
+        self.state = state if state is not None else {}
+        self.sink = None
+        self.last_save = time.monotonic()
+
+    @classmethod
+    def load(cls, path, interval=60):
+        with open(path, 'rb') as file:
+            return cls(path, interval, pickle.load(file))
+
+    def due(self):
+        """
+        Returns whether interval seconds have passed since the last save.
+        """
+        return time.monotonic() - self.last_save >= self.interval
+
+    def resume(self, name):
+        """
+        Returns the saved entry of name, or None if it has none.
+        """
+        return self.state.get(name)
+
+    def clear(self, name):
+        """
+        Remove the entry of name, for example when an optimizer run has finished.
+        """
+        self.state.pop(name, None)
+
+    def save(self, name=None, state=None):
+        """
+        Store state as the entry of name and write the checkpoint. The file is replaced at once,
+        so a run that is killed while saving keeps the previous checkpoint.
+        """
+        if name is not None:
+            self.state[name] = state
+        if self.sink is not None:
+            self.sink.flush()
+            self.state['sink'] = self.sink.position()
+
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, 'wb') as file:
+            pickle.dump(self.state, file, protocol=pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.path)
+        self.last_save = time.monotonic()
+
+    def remove(self):
+        """
+        Delete the checkpoint file once the run is complete.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
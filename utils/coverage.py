@@ -0,0 +1,81 @@
+from utils.scoring import connection_key
+
+def build_edge_index(connections):
+    """
+    Returns a dict that maps the key of every connection to its edge ID, the bit it uses in coverage masks.
+    """
+    return {connection_key(connection.station1, connection.station2): edge_id for edge_id, connection in enumerate(connections)}
+
+def path_mask(path, edge_index):
+    """
+    Returns the connections of a path as an integer bitmask over edge IDs.
+    """
+    mask = 0
+    for i in range(len(path) - 1):
+        mask |= 1 << edge_index[connection_key(path[i], path[i + 1])]
+    return mask
+
+def mask_edges(mask):
+    """
+    Returns the edge IDs set in a bitmask.
+    """
+    edges = []
+    while mask:
+        lowest = mask & -mask
+        edges.append(lowest.bit_length() - 1)
+        mask ^= lowest
+    return edges
+
+def prune_dominated(candidates, connections=None):
+    """
+    Removes candidate routes that can never be needed in a best selection.
+
+    candidates is a list of (path, duration, mask) tuples. A candidate is dropped if another candidate
+    uses the same connections in at most the same time (this includes the reverse of every route), or
+    uses a strict superset of its connections in at most the same time.
+    If the connections are given and all of them take time, a route over more connections always takes
+    longer, so the search for supersets is skipped.
+    Returns the remaining candidates in their original order.
+    """
+    # Keep the fastest candidate for every set of connections
+    fastest = {}
+    for position, (path, duration, mask) in enumerate(candidates):
+        if mask not in fastest or duration < candidates[fastest[mask]][1]:
+            fastest[mask] = position
+    positions = sorted(fastest.values())
+
+    if connections is not None and all(connection.distance > 0 for connection in connections):
+        return [candidates[position] for position in positions]
+
+    # For every edge the candidates that use it sorted by duration, so supersets are only searched
+    # among candidates that share an edge and are not slower
+    edge_candidates = {}
+    for position in positions:
+        for edge in mask_edges(candidates[position][2]):
+            edge_candidates.setdefault(edge, []).append(position)
+    for edge_positions in edge_candidates.values():
+        edge_positions.sort(key=lambda position: candidates[position][1])
+
+    kept = []
+    for position in positions:
+        _, duration, mask = candidates[position]
+        edges = mask_edges(mask)
+        if edges and is_dominated(position, candidates, edge_candidates[min(edges, key=lambda edge: len(edge_candidates[edge]))]):
+            continue
+        kept.append(candidates[position])
+
+    return kept
+
+def is_dominated(position, candidates, edge_positions):
+    """
+    Returns whether a candidate in edge_positions, sorted by duration, covers a strict superset of the
+    connections of candidates[position] in at most the same time.
+    """
+    _, duration, mask = candidates[position]
+    for other in edge_positions:
+        _, other_duration, other_mask = candidates[other]
+        if other_duration > duration:
+            return False
+        if other != position and other_mask != mask and not mask & ~other_mask:
+            return True
+    return False
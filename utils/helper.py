@@ -1,34 +1,180 @@
-from collections import defaultdict
+from bisect import bisect_right
 
-def search(network, current_station, route, current_time, max_duration, max_stations, max_reuse, connection_usage, trajectories, visited):
-    """Recursive function to search for valid trajectories."""
-    if 0 < current_time <= max_duration and len(route) <= max_stations:
-        trajectories.add((tuple(route), current_time))
+def iter_trajectories(network, max_duration, max_stations, max_reuse=1, dedup=False, canonical=False):
+    """
+    Lazily yields all possible trajectories constrained by maximum duration, number of stations,
+    and connection reuse, as (route, total_time) tuples with route a tuple of station names.
 
-    for connection in network.connections:
-        if connection.station1.name == current_station or connection.station2.name == current_station:
-            neighbor = (connection.station2.name if connection.station1.name == current_station else connection.station1.name)
-            time_connection = connection.distance
-            connection_name = tuple(sorted((current_station, neighbor)))
+    The depth-first search runs on an explicit stack over the integer-indexed adjacency of the
+    network, so only the current route is kept in memory. Trajectories are unique unless the
+    network has parallel connections; with dedup=True repeated trajectories are skipped using a
+    set of their hashes instead of the trajectories themselves.
+    Every route is found in both directions. With canonical=True only the direction that starts
+    at the lowest station ID is yielded, which halves the trajectories without keeping any state.
+    """
+    # Routes are only extended while they have less than max_stations stations, and the
+    # shortest trajectory already has two
+    if max_stations < 2:
+        return
 
-            if current_time + time_connection <= max_duration and connection_usage[connection_name] < max_reuse and neighbor not in visited:
-                connection_usage[connection_name] += 1
-                visited.add(neighbor)
+    adjacency = network.adjacency
+    station_names = network.station_names
+    connection_usage = [0] * len(network.connections)
+    visited = [False] * len(station_names)
+    seen = set() if dedup else None
 
-                search(network, neighbor, route + [neighbor], current_time + time_connection, max_duration, max_stations, max_reuse, connection_usage, trajectories, visited)
+    for start_station in range(len(station_names)):
+        visited[start_station] = True
+        route = [station_names[start_station]]
+        route_ids = [start_station]
+        route_edges = []
+        times = [0]
+        stack = [iter(adjacency[start_station])]
 
-                visited.remove(neighbor)
-                connection_usage[connection_name] -= 1
+        while stack:
+            current_time = times[-1]
+            for neighbor, time_connection, edge_id in stack[-1]:
+                if current_time + time_connection <= max_duration and connection_usage[edge_id] < max_reuse and not visited[neighbor]:
+                    break
+            else:
+                # All connections of this station are explored, backtrack
+                stack.pop()
+                times.pop()
+                if route_edges:
+                    connection_usage[route_edges.pop()] -= 1
+                    visited[route_ids.pop()] = False
+                    route.pop()
+                continue
 
-def find_trajectories(network, max_duration, max_stations, max_reuse=1):
-    """Finds all possible trajectories constrained by maximum duration, number of stations, and connection reuse."""
-    trajectories = set() 
-    connection_usage = defaultdict(int)
+            new_time = current_time + time_connection
+            connection_usage[edge_id] += 1
+            visited[neighbor] = True
+            route.append(station_names[neighbor])
+            route_ids.append(neighbor)
+            route_edges.append(edge_id)
+
+            if new_time > 0 and not (canonical and start_station > neighbor):
+                trajectory = (tuple(route), new_time)
+                if seen is None:
+                    yield trajectory
+                else:
+                    key = hash(trajectory)
+                    if key not in seen:
+                        seen.add(key)
+                        yield trajectory
+
+            if len(route) < max_stations:
+                stack.append(iter(adjacency[neighbor]))
+                times.append(new_time)
+            else:
+                # Every extension adds a station, so a full route can not produce valid trajectories anymore
+                connection_usage[route_edges.pop()] -= 1
+                visited[route_ids.pop()] = False
+                route.pop()
+
+        visited[start_station] = False
+
+def best_route(network, max_duration, max_stations, covered=0, min_gain=0, start_stations=None, end_station=None, times_to_end=None):
+    """
+    Returns the route that adds the most to the K-score when the connections in covered, a bitmask
+    over edge IDs, are already used: its new connections * 10000 / connections minus 100 and its
+    duration. Returns (route, total_time, mask, gain) with route a tuple of station IDs, or None if no
+    route within max_duration and max_stations gains more than min_gain.
+
+    Instead of enumerating every route like iter_trajectories, the depth-first search is a branch-and-bound:
+    a route can at most gain the value of the fastest uncovered connections that still fit in its remaining
+    minutes and stations, so a branch is cut as soon as that can not beat the best route found so far.
+    Uncovered connections are tried first, so good routes are found early and most branches are cut.
+    With start_stations only routes from those station IDs are searched, with end_station only routes that
+    end there, and times_to_end (the shortest times to end_station) cuts routes that can not reach it in time.
+    """
+    adjacency = network.adjacency
+    connection_value = 10000 / len(network.connections) if network.connections else 0
+
+    # extra_gains[k] is the most k more connections can add, taking the fastest uncovered connections,
+    # and extra_times[k] the minutes those take
+    uncovered_times = sorted(connection.distance for edge_id, connection in enumerate(network.connections) if not covered >> edge_id & 1)
+    extra_times = [0]
+    extra_gains = [0]
+    gain = 0
+    for minutes in uncovered_times:
+        gain += connection_value - minutes
+        extra_times.append(extra_times[-1] + minutes)
+        extra_gains.append(max(extra_gains[-1], gain))
+
+    def extra_gain(remaining_time, remaining_stations):
+        return extra_gains[min(bisect_right(extra_times, remaining_time) - 1, remaining_stations)]
+
+    ordered_adjacency = [sorted(connections, key=lambda connection: (covered >> connection[2] & 1, connection[1])) for connections in adjacency]
+    visited = [False] * len(adjacency)
+    used = [False] * len(network.connections)
+    best = None
+    best_gain = min_gain
+    nodes = 0
 
-    start_stations = network.stations.keys()
+    for start_station in (range(len(adjacency)) if start_stations is None else start_stations):
+        if -100 + extra_gain(max_duration, max_stations - 1) <= best_gain:
+            continue
 
-    for station in start_stations:
-        visited = {station}
-        search(network, station, [station], 0, max_duration, max_stations, max_reuse, connection_usage, trajectories, visited)
+        visited[start_station] = True
+        route = [start_station]
+        route_edges = []
+        times = [0]
+        gains = [-100]
+        masks = [0]
+        stack = [iter(ordered_adjacency[start_station])]
 
-    return list(trajectories)
\ No newline at end of file
+        while stack:
+            current_time = times[-1]
+            for neighbor, time_connection, edge_id in stack[-1]:
+                new_time = current_time + time_connection
+                if new_time > max_duration or visited[neighbor] or used[edge_id]:
+                    continue
+                if times_to_end is not None and new_time + times_to_end[neighbor] > max_duration:
+                    continue
+
+                new_gain = gains[-1] - time_connection
+                if not covered >> edge_id & 1:
+                    new_gain += connection_value
+                if new_gain + extra_gain(max_duration - new_time, max_stations - len(route) - 1) <= best_gain:
+                    continue
+                break
+            else:
+                # All connections of this station are explored or cut, backtrack
+                stack.pop()
+                times.pop()
+                gains.pop()
+                masks.pop()
+                if route_edges:
+                    used[route_edges.pop()] = False
+                    visited[route.pop()] = False
+                continue
+
+            nodes += 1
+            visited[neighbor] = True
+            used[edge_id] = True
+            route.append(neighbor)
+            route_edges.append(edge_id)
+            mask = masks[-1] | 1 << edge_id
+
+            if (end_station is None or neighbor == end_station) and new_gain > best_gain:
+                best = (tuple(route), new_time, mask, new_gain)
+                best_gain = new_gain
+
+            if neighbor != end_station and len(route) < max_stations:
+                stack.append(iter(ordered_adjacency[neighbor]))
+                times.append(new_time)
+                gains.append(new_gain)
+                masks.append(mask)
+            else:
+                used[route_edges.pop()] = False
+                visited[route.pop()] = False
+
+        visited[start_station] = False
+
+    network.instrumentation.count('bnb_nodes', nodes)
+    return best
+
+def find_trajectories(network, max_duration, max_stations, max_reuse=1):
+    """Finds all possible trajectories constrained by maximum duration, number of stations, and connection reuse."""
+    return list(set(iter_trajectories(network, max_duration, max_stations, max_reuse)))
@@ -0,0 +1,238 @@
+import cProfile
+import json
+import time
+
+class NullTimer:
+    """
+    Timer that does nothing, returned while instrumentation is disabled.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+NULL_TIMER = NullTimer()
+
+class Instrumentation:
+    """
+    Instrumentation that records nothing, the default of every optimizer.
+
+    The optimizers time their phases with `with instrumentation.timer(phase):` or, in loops that run
+    for every iteration, with time_calls, count events with count, notify observers with event and mark
+    a run with `with instrumentation.run(name):`, which calls start_run and end_run. All of these do
+    nothing here, so an optimizer without instrumentation only pays for a few calls per run.
+    """
+    enabled = False
+
+    def timer(self, phase):
+        return NULL_TIMER
+
+    def time_calls(self, obj, method_name, phase):
+        pass
+
+    def count(self, name, amount=1):
+        pass
+
+    def event(self, name, **data):
+        pass
+
+    def run(self, name):
+        return NULL_TIMER
+
+    def start_run(self, name):
+        pass
+
+    def end_run(self, name):
+        pass
+
+NO_INSTRUMENTATION = Instrumentation()
+
+class PhaseTimer:
+    """
+    Adds the time spent in a with block to a phase of a Recorder.
+    """
+    def __init__(self, timers, phase):
+        self.timers = timers
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        timer = self.timers.setdefault(self.phase, [0.0, 0])
+        timer[0] += time.perf_counter() - self.start
+        timer[1] += 1
+        return False
+
+class RecordedRun:
+    """
+    Starts a run of a Recorder when a with block is entered and ends it when the block is left, also when
+    the block raises, so the methods replaced by time_calls are always put back.
+    """
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.recorder.start_run(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.recorder.end_run(self.name)
+        return False
+
+class EventLog:
+    """
+    Observer that appends every event to a file as a line of JSON, for example to follow the
+    improvements of a run from another process. The file is opened for every event, so a line is
+    written right away and no file stays open after the run.
+    """
+    def __init__(self, filepath):
+        self.filepath = filepath
+
+    def __call__(self, name, data):
+        with open(self.filepath, 'a') as file:
+            file.write(json.dumps({"event": name, "time": time.time(), **data}, default=str) + "\n")
+
+class Recorder(Instrumentation):
+    """
+    Instrumentation that records the time per phase, counters and events of optimizer runs.
+
+    observers are called as observer(name, data) for every event, for example every improvement.
+    With profile=True every run is profiled with cProfile. With profile_path or report_path the
+    profile or the summary report is written when a run ends.
+    """
+    enabled = True
+
+    def __init__(self, observers=(), profile=False, profile_path=None, report_path=None):
+        self.observers = list(observers)
+        self.profiler = cProfile.Profile() if profile or profile_path else None
+        self.profile_path = profile_path
+        self.report_path = report_path
+        self.timers = {}
+        self.counters = {}
+        self.runs = []
+        # Runs can be nested, for example a greedy selection inside an exact selection
+        self.open_runs = []
+        self.timed_methods = []
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def timer(self, phase):
+        return PhaseTimer(self.timers, phase)
+
+    def time_calls(self, obj, method_name, phase):
+        """
+        Time every call of obj.method_name as phase until the run ends. The method is replaced by a
+        timed wrapper on the object itself, so the loop that calls it does not change.
+        """
+        method = getattr(obj, method_name)
+        timers = self.timers
+
+        def timed_method(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                timer = timers.setdefault(phase, [0.0, 0])
+                timer[0] += time.perf_counter() - start
+                timer[1] += 1
+
+        self.timed_methods.append((obj, method_name, vars(obj).get(method_name)))
+        setattr(obj, method_name, timed_method)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def event(self, name, **data):
+        for observer in self.observers:
+            observer(name, data)
+
+    def run(self, name):
+        return RecordedRun(self, name)
+
+    def start_run(self, name):
+        if self.profiler is not None and not self.open_runs:
+            self.profiler.enable()
+        self.open_runs.append((name, time.perf_counter()))
+        self.event('run_start', run=name)
+
+    def end_run(self, name):
+        _, start = self.open_runs.pop()
+        seconds = time.perf_counter() - start
+        if self.open_runs:
+            self.event('run_end', run=name, seconds=seconds)
+            return
+
+        if self.profiler is not None:
+            self.profiler.disable()
+
+        # Put back the methods replaced by time_calls, the last replaced first
+        while self.timed_methods:
+            obj, method_name, previous = self.timed_methods.pop()
+            if previous is None:
+                delattr(obj, method_name)
+            else:
+                setattr(obj, method_name, previous)
+
+        self.runs.append((name, seconds))
+        self.event('run_end', run=name, seconds=seconds)
+
+        if self.profile_path is not None:
+            self.dump_profile(self.profile_path)
+        if self.report_path is not None:
+            self.dump_report(self.report_path)
+
+    def report(self):
+        """
+        Returns the recorded timers, counters and outermost runs as a dict, with iterations per second
+        and the acceptance rate if the optimizers counted iterations and accepted moves.
+        """
+        run_seconds = sum(seconds for _, seconds in self.runs)
+        report = {
+            "runs": [{"name": name, "seconds": seconds} for name, seconds in self.runs],
+            "timers": {phase: {"seconds": seconds, "calls": calls} for phase, (seconds, calls) in self.timers.items()},
+            "counters": dict(self.counters),
+        }
+
+        iterations = self.counters.get("iterations", 0)
+        if iterations and run_seconds > 0:
+            report["iterations_per_second"] = iterations / run_seconds
+        if iterations and "accepted" in self.counters:
+            report["acceptance_rate"] = self.counters["accepted"] / iterations
+        return report
+
+    def summary(self):
+        """
+        Returns the report as readable text, with the share of the run time spent in every phase.
+        """
+        report = self.report()
+        run_seconds = sum(run["seconds"] for run in report["runs"])
+
+        lines = [f"{len(report['runs'])} runs in {run_seconds:.3f} seconds"]
+        for phase, timer in sorted(report["timers"].items(), key=lambda item: -item[1]["seconds"]):
+            share = timer["seconds"] / run_seconds * 100 if run_seconds > 0 else 0
+            lines.append(f"  {phase:<20}{timer['seconds']:>10.3f} s{share:>7.1f}%{timer['calls']:>12} calls")
+        for name, value in sorted(report["counters"].items()):
+            lines.append(f"  {name:<20}{value:>12}")
+        if "iterations_per_second" in report:
+            lines.append(f"  iterations/second  {report['iterations_per_second']:>12.0f}")
+        if "acceptance_rate" in report:
+            lines.append(f"  acceptance rate    {report['acceptance_rate']:>12.3f}")
+        return "\n".join(lines)
+
+    def dump_report(self, filepath):
+        """
+        Write the report as JSON.
+        """
+        with open(filepath, 'w') as file:
+            json.dump(self.report(), file, indent=2)
+
+    def dump_profile(self, filepath):
+        """
+        Write the cProfile statistics, readable with pstats or snakeviz.
+        """
+        self.profiler.dump_stats(filepath)
@@ -0,0 +1,84 @@
+import os
+import random
+from multiprocessing import Pool
+from algorithms.hillclimbrandom import HillClimberRailNetwork
+from utils.cache import cached_compiled_network
+
+# Network of the current worker process, loaded once by init_hill_climber_worker
+worker_network = None
+
+def init_hill_climber_worker(stations_file, connections_file, time_limit):
+    """
+    Load the network once in every worker process of the pool, from the memory-mapped arrays of the
+    cached compiled network (utils.cache), so the workers share their pages and do not parse the CSV files.
+    """
+    global worker_network
+    worker_network = HillClimberRailNetwork(max_time_limit=time_limit)
+    worker_network.load_compiled(cached_compiled_network(stations_file, connections_file))
+
+def run_seed(base_seed, num_routes, restart):
+    """
+    Returns the seed of a single run, which only depends on the base seed, the amount of routes
+    and the restart number so results are reproducible regardless of which worker runs it.
+    """
+    return f"{base_seed}:{num_routes}:{restart}"
+
+def hill_climber_task(task):
+    """
+    Run a single hill climber in a worker process.
+    task is a tuple of (num_routes, restart, num_iterations, base_seed, keep_scores).
+    """
+    num_routes, restart, num_iterations, base_seed, keep_scores = task
+    seed = run_seed(base_seed, num_routes, restart)
+    random.seed(seed)
+
+    best_routes, best_K_score, k_score_list, _ = worker_network.hill_climber_optimization(
+        num_iterations, num_routes, record_trajectories=False, verbose=False
+    )
+
+    return {
+        "num_routes": num_routes,
+        "restart": restart,
+        "seed": seed,
+        "best_K_score": best_K_score,
+        "best_routes": [([station.name for station in route], total_time) for route, total_time in best_routes],
+        "k_scores": k_score_list if keep_scores else None,
+    }
+
+def iter_parallel_hill_climber(stations_file, connections_file, time_limit, route_counts, restarts=1, num_iterations=20000, workers=None, base_seed=0, keep_scores=True):
+    """
+    Run a hill climber for every amount of routes in route_counts, restarts times each, on a pool of
+    worker processes. Yields the result of every run as soon as it finishes, so results can be
+    processed without keeping all of them in memory. With keep_scores=False the K-scores of the
+    iterations are not sent back, only the best solution of every run.
+    """
+    tasks = [
+        (num_routes, restart, num_iterations, base_seed, keep_scores)
+        for num_routes in route_counts
+        for restart in range(restarts)
+    ]
+    workers = workers or os.cpu_count()
+
+    if workers == 1:
+        # In the current process, for example in a worker of the experiment service
+        init_hill_climber_worker(stations_file, connections_file, time_limit)
+        for task in tasks:
+            yield hill_climber_task(task)
+        return
+
+    # Compile and store the network before the workers start, so they only load it
+    cached_compiled_network(stations_file, connections_file)
+    with Pool(processes=workers, initializer=init_hill_climber_worker, initargs=(stations_file, connections_file, time_limit)) as pool:
+        for result in pool.imap_unordered(hill_climber_task, tasks):
+            yield result
+
+def run_parallel_hill_climber(stations_file, connections_file, time_limit, route_counts, restarts=1, num_iterations=20000, workers=None, base_seed=0, keep_scores=True):
+    """
+    Run the hill climbers of iter_parallel_hill_climber and return all results,
+    ordered by amount of routes and restart.
+    """
+    results = list(iter_parallel_hill_climber(
+        stations_file, connections_file, time_limit, route_counts, restarts, num_iterations, workers, base_seed, keep_scores
+    ))
+    results.sort(key=lambda result: (result["num_routes"], result["restart"]))
+    return results
@@ -0,0 +1,298 @@
+import csv
+import glob
+import os
+from array import array
+import numpy as np
+
+RESULT_FORMATS = ('npy', 'csv', 'parquet')
+
+def result_path(stem, result_format):
+    """
+    Returns the path results with the given stem are written to: a .csv or .parquet file, or a directory of .npy chunks.
+    """
+    if result_format == 'npy':
+        return stem
+    return f"{stem}.{result_format}"
+
+def open_result_sink(stem, station_names, result_format='npy', batch_size=10000, position=None):
+    """
+    Returns a result sink for the given format, writing to result_path(stem, result_format).
+    With a position from ResultSink.position the sink continues the existing results at that position.
+    """
+    sinks = {'npy': NpyResultSink, 'csv': CsvResultSink, 'parquet': ParquetResultSink}
+    if result_format not in sinks:
+        raise ValueError(f"Unknown result format {result_format!r}, choose from {', '.join(RESULT_FORMATS)}")
+    return sinks[result_format](result_path(stem, result_format), station_names, batch_size, position)
+
+class ResultSink:
+    """
+    Collects the iterations of optimizer runs and writes them in batches.
+
+    A record is the run, the iteration, the K-score and the routes of the solution of one iteration,
+    with every route stored as station IDs. Records are buffered in flat arrays and written every
+    batch_size records, so a long run never keeps its history in memory.
+    Optimizers call new_run at the start of a run and write for every iteration.
+
+    position returns where the written results end, for a checkpoint (utils.checkpoint). A sink
+    created with that position drops everything written after it and continues from there.
+    """
+    def __init__(self, path, station_names, batch_size=10000, position=None):
+        self.path = path
+        self.station_names = list(station_names)
+        self.batch_size = batch_size
+        self.run = -1
+        self.num_records = 0
+        if position is not None:
+            self.run = position['run']
+            self.num_records = position['num_records']
+        self.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def clear(self):
+        self.runs = array('i')
+        self.iterations = array('q')
+        self.k_scores = array('d')
+        self.route_offsets = array('q', [0])
+        self.station_offsets = array('q', [0])
+        self.stations = array('i')
+
+    def new_run(self):
+        """
+        Start a new run, returns its number.
+        """
+        self.run += 1
+        return self.run
+
+    def write(self, iteration, k_score, routes):
+        """
+        Add the record of one iteration. routes is a Solution or another sequence of Route tuples.
+        """
+        self.runs.append(self.run)
+        self.iterations.append(iteration)
+        self.k_scores.append(k_score)
+        for route in routes:
+            self.stations.extend(route.stations)
+            self.station_offsets.append(len(self.stations))
+        self.route_offsets.append(len(self.station_offsets) - 1)
+
+        if len(self.k_scores) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered records.
+        """
+        if not self.k_scores:
+            return
+
+        self.write_batch({
+            'runs': np.frombuffer(self.runs, dtype=np.int32),
+            'iterations': np.frombuffer(self.iterations, dtype=np.int64),
+            'k_scores': np.frombuffer(self.k_scores, dtype=np.float64),
+            'route_offsets': np.frombuffer(self.route_offsets, dtype=np.int64),
+            'station_offsets': np.frombuffer(self.station_offsets, dtype=np.int64),
+            'stations': np.frombuffer(self.stations, dtype=np.int32),
+        })
+        self.num_records += len(self.k_scores)
+        self.clear()
+
+    def position(self):
+        """
+        Returns the position after the written records, call flush first to include the buffered ones.
+        """
+        return {'run': self.run, 'num_records': self.num_records}
+
+    def close(self):
+        self.flush()
+
+    def write_batch(self, batch):
+        raise NotImplementedError
+
+class NpyResultSink(ResultSink):
+    """
+    Writes every batch as NumPy .npy files in a directory, chunk-00000.k_scores.npy and so on.
+    The station names are written once to stations.npy.
+    """
+    def __init__(self, path, station_names, batch_size=10000, position=None):
+        super().__init__(path, station_names, batch_size, position)
+        os.makedirs(path, exist_ok=True)
+        self.num_chunks = position['num_chunks'] if position is not None else 0
+        for old_chunk in glob.glob(os.path.join(path, "chunk-*.npy")):
+            if int(os.path.basename(old_chunk)[6:11]) >= self.num_chunks:
+                os.remove(old_chunk)
+        np.save(os.path.join(path, "stations.npy"), np.array(self.station_names))
+
+    def position(self):
+        return {**super().position(), 'num_chunks': self.num_chunks}
+
+    def write_batch(self, batch):
+        for name, values in batch.items():
+            np.save(os.path.join(self.path, f"chunk-{self.num_chunks:05d}.{name}.npy"), values)
+        self.num_chunks += 1
+
+class CsvResultSink(ResultSink):
+    """
+    Writes the records as CSV rows. A trajectory is written as station IDs, with '-' between the
+    stations of a route and '|' between routes. The station names are written to a second CSV file.
+    """
+    def __init__(self, path, station_names, batch_size=10000, position=None):
+        super().__init__(path, station_names, batch_size, position)
+        with open(f"{os.path.splitext(path)[0]}.stations.csv", mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(["Station ID", "Station"])
+            writer.writerows(enumerate(self.station_names))
+
+        if position is not None:
+            # Rows written after the position are cut off
+            self.file = open(path, mode='r+', newline='')
+            self.file.seek(position['offset'])
+            self.file.truncate()
+            self.writer = csv.writer(self.file)
+        else:
+            self.file = open(path, mode='w', newline='')
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(["Run", "Iteration", "K-Score", "Trajectory"])
+
+    def position(self):
+        self.file.flush()
+        return {**super().position(), 'offset': self.file.tell()}
+
+    def write_batch(self, batch):
+        stations = batch['stations'].tolist()
+        station_offsets = batch['station_offsets'].tolist()
+        route_offsets = batch['route_offsets'].tolist()
+
+        rows = []
+        for record, (run, iteration, k_score) in enumerate(zip(batch['runs'].tolist(), batch['iterations'].tolist(), batch['k_scores'].tolist())):
+            routes = (
+                '-'.join(map(str, stations[station_offsets[route]:station_offsets[route + 1]]))
+                for route in range(route_offsets[record], route_offsets[record + 1])
+            )
+            rows.append((run, iteration, k_score, '|'.join(routes)))
+        self.writer.writerows(rows)
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+class ParquetResultSink(ResultSink):
+    """
+    Writes every batch as a row group of a Parquet file, with the trajectory as a list of lists of
+    station IDs. The station names are stored in the metadata of the file. Needs pyarrow.
+
+    A Parquet file can only be read once it is closed, so the batches are written to path.partial,
+    which replaces path when the sink is closed or its position is taken for a checkpoint.
+    """
+    def __init__(self, path, station_names, batch_size=10000, position=None):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Writing Parquet results needs pyarrow, install it or use the 'npy' or 'csv' format")
+
+        super().__init__(path, station_names, batch_size, position)
+        self.pa = pa
+        self.pq = pq
+        self.schema = pa.schema(
+            [
+                ('run', pa.int32()),
+                ('iteration', pa.int64()),
+                ('k_score', pa.float64()),
+                ('trajectory', pa.list_(pa.list_(pa.int32()))),
+            ],
+            metadata={'stations': '\n'.join(self.station_names)},
+        )
+        self.partial_path = path + ".partial"
+        self.open_writer(position['num_row_groups'] if position is not None else 0)
+
+    def open_writer(self, num_row_groups):
+        """
+        Start a new partial file with the first num_row_groups row groups of the file at path.
+        """
+        self.writer = self.pq.ParquetWriter(self.partial_path, self.schema)
+        if num_row_groups:
+            # Parquet files cannot be appended to, so the written row groups are copied
+            with self.pq.ParquetFile(self.path) as written:
+                for row_group in range(num_row_groups):
+                    self.writer.write_table(written.read_row_group(row_group))
+        self.num_row_groups = num_row_groups
+
+    def close_writer(self):
+        self.writer.close()
+        os.replace(self.partial_path, self.path)
+
+    def position(self):
+        # The results so far are closed into a readable file, and writing continues in a copy of it
+        self.close_writer()
+        self.open_writer(self.num_row_groups)
+        return {**super().position(), 'num_row_groups': self.num_row_groups}
+
+    def write_batch(self, batch):
+        pa = self.pa
+        routes = pa.ListArray.from_arrays(batch['station_offsets'].astype(np.int32), batch['stations'])
+        trajectories = pa.ListArray.from_arrays(batch['route_offsets'].astype(np.int32), routes)
+        table = pa.Table.from_arrays([batch['runs'], batch['iterations'], batch['k_scores'], trajectories], schema=self.schema)
+        self.writer.write_table(table)
+        self.num_row_groups += 1
+
+    def close(self):
+        super().close()
+        self.close_writer()
+
+def read_results(path):
+    """
+    Yields the records written by a result sink as (run, iteration, K-score, routes) tuples,
+    with routes a tuple of tuples of station IDs.
+    """
+    if os.path.isdir(path):
+        num_chunks = len(glob.glob(os.path.join(path, "chunk-*.k_scores.npy")))
+        for chunk in range(num_chunks):
+            batch = {
+                name: np.load(os.path.join(path, f"chunk-{chunk:05d}.{name}.npy"))
+                for name in ('runs', 'iterations', 'k_scores', 'route_offsets', 'station_offsets', 'stations')
+            }
+            stations = batch['stations'].tolist()
+            station_offsets = batch['station_offsets'].tolist()
+            route_offsets = batch['route_offsets'].tolist()
+            for record, (run, iteration, k_score) in enumerate(zip(batch['runs'].tolist(), batch['iterations'].tolist(), batch['k_scores'].tolist())):
+                routes = tuple(
+                    tuple(stations[station_offsets[route]:station_offsets[route + 1]])
+                    for route in range(route_offsets[record], route_offsets[record + 1])
+                )
+                yield run, iteration, k_score, routes
+
+    elif path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        for row_group in range(parquet_file.num_row_groups):
+            for row in parquet_file.read_row_group(row_group).to_pylist():
+                yield row['run'], row['iteration'], row['k_score'], tuple(tuple(route) for route in row['trajectory'])
+
+    else:
+        with open(path, newline='') as file:
+            reader = csv.reader(file)
+            next(reader)
+            for run, iteration, k_score, trajectory in reader:
+                routes = tuple(tuple(int(station) for station in route.split('-')) for route in trajectory.split('|')) if trajectory else ()
+                yield int(run), int(iteration), float(k_score), routes
+
+def read_station_names(path):
+    """
+    Returns the station names that belong to the station IDs of written results.
+    """
+    if os.path.isdir(path):
+        return [str(name) for name in np.load(os.path.join(path, "stations.npy"))]
+
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).metadata[b'stations'].decode().split('\n')
+
+    with open(f"{os.path.splitext(path)[0]}.stations.csv", newline='') as file:
+        reader = csv.reader(file)
+        next(reader)
+        return [station for _, station in reader]
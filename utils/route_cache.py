@@ -0,0 +1,63 @@
+import pickle
+from collections import OrderedDict
+
+class RouteCache:
+    """
+    Least recently used cache of enumerated routes, keyed by (start, end, time_limit).
+
+    Routes are stored as tuples of station IDs. With maxsize set the least recently used
+    station pair is dropped once more than maxsize pairs are stored.
+    """
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.routes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.routes)
+
+    def __contains__(self, key):
+        return key in self.routes
+
+    def get(self, key):
+        """
+        Returns the cached routes for a key, or None if they are not cached.
+        """
+        routes = self.routes.get(key)
+        if routes is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.routes.move_to_end(key)
+        return routes
+
+    def put(self, key, routes):
+        """
+        Store the routes for a key, dropping the least recently used pair if the cache is full.
+        """
+        self.routes[key] = tuple(routes)
+        self.routes.move_to_end(key)
+        if self.maxsize is not None and len(self.routes) > self.maxsize:
+            self.routes.popitem(last=False)
+
+    def save(self, filepath, station_names):
+        """
+        Write the cache to disk together with the station names the IDs refer to.
+        """
+        with open(filepath, 'wb') as file:
+            pickle.dump({"station_names": list(station_names), "routes": dict(self.routes)}, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load(self, filepath, station_names):
+        """
+        Add the routes of a cache file written by save, if it belongs to the same stations.
+        """
+        with open(filepath, 'rb') as file:
+            data = pickle.load(file)
+
+        if data["station_names"] != list(station_names):
+            raise ValueError(f"Route cache {filepath} belongs to a different network.")
+
+        for key, routes in data["routes"].items():
+            self.put(key, routes)
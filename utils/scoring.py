@@ -1,3 +1,15 @@
+from collections import defaultdict
+
+def connection_key(station1, station2):
+    """
+    Returns the key of the connection between two stations of a route.
+    """
+    if hasattr(station1, 'name') and hasattr(station2, 'name'):
+        # Use name for Station objects
+        station1, station2 = station1.name, station2.name
+    # Use strings directly (Greedy)
+    return (station1, station2) if station1 <= station2 else (station2, station1)
+
 def calculate_K_score(trajectories, connections):
     """
     Calculate the K-score for a list of trajectories.
@@ -6,13 +18,7 @@ def calculate_K_score(trajectories, connections):
 
     for trajectory, total_time in trajectories:
         for i in range(len(trajectory) - 1):
-            if hasattr(trajectory[i], 'name') and hasattr(trajectory[i + 1], 'name'):
-                # Use name for Station objects 
-                connection = tuple(sorted((trajectory[i].name, trajectory[i + 1].name)))
-            else:
-                # Use strings directly (Greedy)
-                connection = tuple(sorted((trajectory[i], trajectory[i + 1])))
-            used_connections.add(connection)
+            used_connections.add(connection_key(trajectory[i], trajectory[i + 1]))
 
     if len(connections) > 0:
         p = len(used_connections) / len(connections)
@@ -26,3 +32,153 @@ def calculate_K_score(trajectories, connections):
 
     return K_score
 
+class IncrementalKScore:
+    """
+    Keeps the K-score of a changing list of trajectories up to date.
+
+    Stores how many routes use each connection, the number of routes and the total minutes,
+    so adding, removing or replacing a route only costs the length of the routes involved.
+    score_with answers what the K-score would be after replacing routes without changing anything.
+    """
+    def __init__(self, connections, trajectories=()):
+        self.num_connections = len(connections)
+        self.connection_usage = defaultdict(int)
+        self.num_used_connections = 0
+        self.route_connections = []
+        self.route_times = []
+        self.total_time = 0
+
+        for route, total_time in trajectories:
+            self.add_route(route, total_time)
+
+    def route_keys(self, route):
+        """
+        Returns the set of connections used by a route.
+        """
+        return {connection_key(route[i], route[i + 1]) for i in range(len(route) - 1)}
+
+    def add_route(self, route, total_time):
+        """
+        Add a route to the end of the trajectories.
+        """
+        keys = self.route_keys(route)
+        for key in keys:
+            if self.connection_usage[key] == 0:
+                self.num_used_connections += 1
+            self.connection_usage[key] += 1
+
+        self.route_connections.append(keys)
+        self.route_times.append(total_time)
+        self.total_time += total_time
+
+    def remove_route(self, index):
+        """
+        Remove the route at the given index.
+        """
+        for key in self.route_connections.pop(index):
+            self.connection_usage[key] -= 1
+            if self.connection_usage[key] == 0:
+                self.num_used_connections -= 1
+                del self.connection_usage[key]
+
+        self.total_time -= self.route_times.pop(index)
+
+    def replace_route(self, index, route, total_time):
+        """
+        Replace the route at the given index.
+        """
+        self.replace_routes({index: (route, total_time)})
+
+    def replace_routes(self, replacements):
+        """
+        Replace routes, replacements maps route indices to new (route, total_time) tuples.
+        Like Solution.replace, None removes a route and indices from the current amount of routes on add routes.
+        """
+        num_routes = len(self.route_times)
+        removed = []
+        added = []
+        for index, new_route in replacements.items():
+            if index >= num_routes:
+                added.append((index, new_route))
+                continue
+
+            for key in self.route_connections[index]:
+                self.connection_usage[key] -= 1
+                if self.connection_usage[key] == 0:
+                    self.num_used_connections -= 1
+                    del self.connection_usage[key]
+
+            if new_route is None:
+                removed.append(index)
+                continue
+
+            route, total_time = new_route
+            keys = self.route_keys(route)
+            for key in keys:
+                if self.connection_usage[key] == 0:
+                    self.num_used_connections += 1
+                self.connection_usage[key] += 1
+
+            self.route_connections[index] = keys
+            self.total_time += total_time - self.route_times[index]
+            self.route_times[index] = total_time
+
+        # The usage of removed routes is already taken away, only their place in the lists is left
+        for index in sorted(removed, reverse=True):
+            del self.route_connections[index]
+            self.total_time -= self.route_times.pop(index)
+        for _, (route, total_time) in sorted(added, key=lambda item: item[0]):
+            self.add_route(route, total_time)
+
+    def score(self):
+        """
+        Returns the K-score of the current trajectories.
+        """
+        return self.k_score(self.num_used_connections, len(self.route_times), self.total_time)
+
+    def score_with(self, replacements):
+        """
+        Returns the K-score after replacing routes, without changing the current trajectories.
+        replacements maps route indices to new (route, total_time) tuples, in the format of replace_routes.
+        """
+        usage_change = defaultdict(int)
+        num_trajectories = len(self.route_times)
+        total_time = self.total_time
+
+        for index, new_route in replacements.items():
+            if index < len(self.route_times):
+                for key in self.route_connections[index]:
+                    usage_change[key] -= 1
+                total_time -= self.route_times[index]
+                if new_route is None:
+                    num_trajectories -= 1
+                    continue
+            else:
+                num_trajectories += 1
+
+            route, route_time = new_route
+            for key in self.route_keys(route):
+                usage_change[key] += 1
+            total_time += route_time
+
+        num_used_connections = self.num_used_connections
+        for key, change in usage_change.items():
+            usage = self.connection_usage.get(key, 0)
+            if usage == 0 and change > 0:
+                num_used_connections += 1
+            elif usage > 0 and usage + change == 0:
+                num_used_connections -= 1
+
+        return self.k_score(num_used_connections, num_trajectories, total_time)
+
+    def k_score(self, num_used_connections, num_trajectories, total_time):
+        """
+        Calculate the K-score from the number of used connections, routes and minutes,
+        in the same way as calculate_K_score.
+        """
+        if self.num_connections > 0:
+            p = num_used_connections / self.num_connections
+        else:
+            p = 0
+
+        return p * 10000 - (num_trajectories * 100 + total_time)
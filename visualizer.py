@@ -1,13 +1,39 @@
+import os
 import networkx as nx
+import matplotlib
 import matplotlib.pyplot as plt
-import random
-import geopandas as gpd
-from shapely.geometry import Point, LineString
-import contextily as ctx
-import pandas as pd
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
 import numpy as np
 
-def visualize_network(rail_network, optimized_trajectories):
+# Basemap tiles are kept here between runs, next to the other cached artifacts
+TILE_CACHE_DIR = os.path.join(".cache", "tiles")
+
+# Predefined colors for different trajectories
+COLORS = ['red', 'blue', 'green', 'orange', 'purple', 'cyan', 'magenta', 'yellow']
+
+def use_headless_backend():
+    """
+    Render with the Agg backend, which needs no display and never opens a window.
+    Plots with an output_path are saved either way, plots without one are then not shown.
+    """
+    matplotlib.use("Agg")
+
+def show_or_save(fig, output_path=None):
+    """
+    Save the figure to output_path and close it, or show it if no path is given.
+    """
+    if output_path is None:
+        plt.show()
+        return
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fig.savefig(output_path, dpi=150, bbox_inches="tight")
+    plt.close(fig)
+
+def visualize_network(rail_network, optimized_trajectories, output_path=None):
     """
     Visualizes the railway network using NetworkX and Matplotlib.
     """
@@ -25,156 +51,232 @@ def visualize_network(rail_network, optimized_trajectories):
     pos = nx.get_node_attributes(G, 'pos')
 
     # Draw the network
-    plt.figure(figsize=(12, 8))
+    fig = plt.figure(figsize=(12, 8))
     nx.draw(G, pos, with_labels=True, node_size=300, node_color='lightblue', edge_color='grey', font_size=8)
 
-    # Predefined colors for different trajectories
-    colors = ['red', 'blue', 'green', 'orange', 'purple', 'cyan', 'magenta', 'yellow']
     legend_labels = []
 
     # Draw the optimized trajectories with different colors
     for idx, (route, duration) in enumerate(optimized_trajectories):
-        color = colors[idx % len(colors)]  # Cycle through colors if more trajectories exist
+        color = COLORS[idx % len(COLORS)]  # Cycle through colors if more trajectories exist
         nx.draw_networkx_edges(G, pos, edgelist=[(route[i], route[i + 1]) for i in range(len(route) - 1)],
                                edge_color=color, width=2)
         legend_labels.append(f'Trajectory {idx + 1}')  # Add legend label
 
     # Add legend
-    handles = [plt.Line2D([0], [0], color=colors[i % len(colors)], lw=2) for i in range(len(legend_labels))]
+    handles = [Line2D([0], [0], color=COLORS[i % len(COLORS)], lw=2) for i in range(len(legend_labels))]
     plt.legend(handles, legend_labels, title="Trajectories", loc='upper left')
 
     plt.title("Railway Network Visualization")
-    plt.show()
+    show_or_save(fig, output_path)
 
 
-def visualize_network_on_map(rail_network, optimized_trajectories):
+class NetworkMap:
     """
-    Visualizes the railway network on a geographical map using GeoPandas.
-    """
-    # Convert stations to a GeoDataFrame
-    station_geometries = [Point(station.x, station.y) for station in rail_network.stations.values()]
-    station_names = [station.name for station in rail_network.stations.values()]
-    stations_gdf = gpd.GeoDataFrame({"station": station_names}, geometry=station_geometries, crs="EPSG:4326")
-
-    # Convert connections to a GeoDataFrame
-    connection_geometries = [
-        LineString([(conn.station1.x, conn.station1.y), (conn.station2.x, conn.station2.y)])
-        for conn in rail_network.connections
-    ]
-    connections_gdf = gpd.GeoDataFrame(geometry=connection_geometries, crs="EPSG:4326")
-
-    # Convert trajectories to a GeoDataFrame
-    trajectory_geometries = []
-    for route, _ in optimized_trajectories:
-        points = [(rail_network.stations[station].x, rail_network.stations[station].y) for station in route]
-        trajectory_geometries.append(LineString(points))
+    A map of the stations and connections of a rail network, on which solutions are drawn.
 
-    trajectories_gdf = gpd.GeoDataFrame(geometry=trajectory_geometries, crs="EPSG:4326")
-
-    # Create a plot
-    fig, ax = plt.subplots(figsize=(12, 10))
+    The station and connection layers and the basemap are drawn once, so rendering many solutions
+    only draws their trajectories. With basemap=True OpenStreetMap tiles are added with contextily
+    and kept in tile_cache_dir, so later runs do not download them again. Without contextily, or
+    when the tiles cannot be fetched (for example on a node without internet), the map is drawn on
+    a plain longitude/latitude canvas from the coordinates of the stations.
+    """
+    def __init__(self, rail_network, basemap=True, tile_cache_dir=TILE_CACHE_DIR, figsize=(12, 10)):
+        self.positions = {station.name: (station.x, station.y) for station in rail_network.stations.values()}
+        self.fig, self.ax = plt.subplots(figsize=figsize)
+        self.solution_artists = []
+
+        # Plot connections and stations
+        connection_segments = [
+            [self.positions[conn.station1.name], self.positions[conn.station2.name]] for conn in rail_network.connections
+        ]
+        self.ax.add_collection(LineCollection(connection_segments, colors="grey", linewidths=0.5, alpha=0.7, zorder=1))
+        coordinates = np.array(list(self.positions.values()))
+        self.ax.scatter(coordinates[:, 0], coordinates[:, 1], color="blue", s=10, zorder=2)
+        self.ax.autoscale_view()
+
+        self.basemap = basemap and self.add_basemap(tile_cache_dir)
+        if not self.basemap:
+            # Without tiles the degrees are scaled like a map of the Netherlands
+            self.ax.set_aspect(1 / np.cos(np.radians(coordinates[:, 1].mean())))
+            self.ax.grid(True, alpha=0.3)
+
+        self.ax.set_xlabel("Longitude", fontsize=12)
+        self.ax.set_ylabel("Latitude", fontsize=12)
+
+    def add_basemap(self, tile_cache_dir):
+        """
+        Add OpenStreetMap tiles to the map, returns False if that is not possible.
+        """
+        try:
+            import contextily as ctx
+        except ImportError:
+            print("contextily is not installed, the map is drawn without basemap.")
+            return False
+
+        if tile_cache_dir is not None:
+            os.makedirs(tile_cache_dir, exist_ok=True)
+            ctx.set_cache_dir(tile_cache_dir)
+        try:
+            ctx.add_basemap(self.ax, source=ctx.providers.OpenStreetMap.Mapnik, crs="EPSG:4326")
+        except Exception as e:
+            print(f"The basemap could not be loaded ({e}), the map is drawn without basemap.")
+            return False
+        return True
+
+    def draw(self, optimized_trajectories, title="Railway Network and Trajectories on the Map"):
+        """
+        Draw the trajectories of a solution, replacing those of the previous solution.
+        optimized_trajectories is a list of (route, duration) tuples with routes of station names.
+        """
+        for artist in self.solution_artists:
+            artist.remove()
+        self.solution_artists = []
+
+        # Plot trajectories with different colors
+        handles = []
+        for idx, (route, _) in enumerate(optimized_trajectories):
+            color = COLORS[idx % len(COLORS)]
+            points = [self.positions[station] for station in route]
+            line = LineCollection([points], colors=color, linewidths=2, zorder=3)
+            self.ax.add_collection(line)
+            self.solution_artists.append(line)
+            handles.append(Line2D([0], [0], color=color, lw=2, label=f"Trajectory {idx + 1}"))
+
+        self.ax.set_title(title, fontsize=14)
+        if handles:
+            self.solution_artists.append(self.ax.legend(handles=handles, loc="upper right"))
+
+    def render(self, optimized_trajectories, output_path=None, title="Railway Network and Trajectories on the Map"):
+        """
+        Draw a solution and save the map to output_path, or show it if no path is given.
+        """
+        self.draw(optimized_trajectories, title)
+        if output_path is None:
+            plt.show()
+            return
 
-    # Plot connections
-    connections_gdf.plot(ax=ax, color="grey", linewidth=0.5, alpha=0.7, label="Connections")
+        directory = os.path.dirname(output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # The figure is kept open for the next solution
+        self.fig.savefig(output_path, dpi=150, bbox_inches="tight")
 
-    # Plot stations
-    stations_gdf.plot(ax=ax, color="blue", markersize=10, label="Stations")
+    def close(self):
+        plt.close(self.fig)
 
-    # Plot trajectories with different colors
-    colors = ['red', 'blue', 'green', 'orange', 'purple', 'cyan', 'magenta', 'yellow']
-    for idx, trajectory in enumerate(trajectories_gdf.geometry):
-        trajectories_gdf.iloc[[idx]].plot(ax=ax, color=colors[idx % len(colors)], linewidth=2, label=f"Trajectory {idx + 1}")
 
-    # Add a basemap
-    ctx.add_basemap(ax, source=ctx.providers.OpenStreetMap.Mapnik, crs="EPSG:4326")
+def visualize_network_on_map(rail_network, optimized_trajectories, output_path=None, basemap=True):
+    """
+    Visualizes the railway network on a geographical map.
+    """
+    network_map = NetworkMap(rail_network, basemap=basemap)
+    network_map.render(optimized_trajectories, output_path)
+    network_map.close()
 
-    # Adjust layout
-    ax.set_title("Railway Network and Trajectories on the Map", fontsize=14)
-    ax.set_xlabel("Longitude", fontsize=12)
-    ax.set_ylabel("Latitude", fontsize=12)
-    ax.legend(loc="upper right")
 
-    plt.show()
+def render_solutions(rail_network, solutions, output_dir, basemap=True, file_format="png"):
+    """
+    Render a map of every solution into output_dir, as solution-00000.png and so on.
+    solutions yields (title, trajectories) tuples. Returns the paths of the written files.
+    """
+    network_map = NetworkMap(rail_network, basemap=basemap)
+    paths = []
+    try:
+        for index, (title, trajectories) in enumerate(solutions):
+            path = os.path.join(output_dir, f"solution-{index:05d}.{file_format}")
+            network_map.render(trajectories, path, title)
+            paths.append(path)
+    finally:
+        network_map.close()
+    return paths
 
 
-def plot_k_scores(k_score_list):
+def render_results(rail_network, results_path, output_dir, best=10, basemap=True, file_format="png"):
+    """
+    Render the best solutions of a results file or directory written by utils.results into output_dir,
+    together with the K-score distribution and progression and the total duration against the K-score of all records.
+    Returns the paths of the written files.
+    """
+    from utils.results import read_results, read_station_names
+
+    station_names = read_station_names(results_path)
+    # Station IDs of the results file as station IDs of the network, for the durations of the routes
+    network_ids = [rail_network.station_ids[name] for name in station_names]
+    k_scores = []
+    durations = []
+    best_records = []
+    for run, iteration, k_score, routes in read_results(results_path):
+        k_scores.append(k_score)
+        durations.append(sum(rail_network.route_time([network_ids[station] for station in route]) for route in routes))
+        # Only the best records keep their routes
+        best_records.append((k_score, run, iteration, routes))
+        if len(best_records) > 2 * best:
+            best_records = sorted(best_records, key=lambda record: -record[0])[:best]
+    best_records = sorted(best_records, key=lambda record: -record[0])[:best]
+
+    solutions = (
+        (
+            f"Run {run}, iteration {iteration}, K-score {k_score:.1f}",
+            [([station_names[station] for station in route], None) for route in routes],
+        )
+        for k_score, run, iteration, routes in best_records
+    )
+    paths = render_solutions(rail_network, solutions, output_dir, basemap, file_format)
+
+    for name, plot in (("k_score_distribution", plot_k_score_distribution), ("k_score_progression", plot_k_scores)):
+        path = os.path.join(output_dir, f"{name}.{file_format}")
+        plot(k_scores, output_path=path)
+        paths.append(path)
+
+    path = os.path.join(output_dir, f"duration_vs_k_score.{file_format}")
+    plot_duration_vs_score(k_scores, durations, output_path=path)
+    paths.append(path)
+    return paths
+
+
+def plot_k_scores(k_score_list, output_path=None):
     """
     Plots the progression of K-scores over iterations during an experiment.
     """
-    plt.figure(figsize=(10, 6))
+    fig = plt.figure(figsize=(10, 6))
     plt.plot(range(len(k_score_list)), k_score_list, label="K-Score over Iterations", color="blue")
     plt.title("K-Score Progression")
     plt.xlabel("Iteration")
     plt.ylabel("K-Score")
     plt.grid(True)
     plt.legend()
-    plt.show()
+    show_or_save(fig, output_path)
 
 
-def plot_k_score_distribution(k_scores):
+def plot_k_score_distribution(k_scores, output_path=None):
     """
     Plots the distribution of K-scores from multiple experiment runs.
     """
+    fig = plt.figure()
     plt.hist(k_scores, bins=20, edgecolor='black', alpha=0.75)
     plt.title("K-Score Distribution")
     plt.xlabel("K-Score")
     plt.ylabel("Frequency")
     plt.grid(True)
-    plt.show()
-
-
-def plot_scores_from_csv(csv_file_path):
-    """
-    Reads K-scores from a CSV file and plots the distribution.
-
-    Parameters:
-    -----------
-    csv_file_path : str
-        Path to the CSV file containing the 'K-Score' column.
-    """
-    try:
-        # Load the CSV file
-        data = pd.read_csv(csv_file_path)
-
-        # Ensure 'K-Score' column exists
-        if 'K-Score' not in data.columns:
-            print(f"Error: 'K-Score' column not found in {csv_file_path}.")
-            return
-
-        # Extract K-scores
-        k_scores = data['K-Score']
+    show_or_save(fig, output_path)
 
-        # Plot the distribution
-        plt.figure(figsize=(10, 6))
-        plt.hist(k_scores, bins=20, edgecolor='black', alpha=0.75)
-        plt.title("K-Score Distribution")
-        plt.xlabel("K-Score")
-        plt.ylabel("Frequency")
-        plt.grid(True)
-        plt.show()
 
-    except Exception as e:
-        print(f"Error while plotting scores from {csv_file_path}: {e}")
-
-def plot_duration_vs_score(k_score_list, trajectory_list):
+def plot_duration_vs_score(k_scores, durations, output_path=None):
     """
-    Creates a scatterplot showing the relationship between total duration of trajectories 
-    and their corresponding K-scores.
+    Creates a scatterplot showing the relationship between the total duration of the routes
+    of every solution and its K-score.
     """
-    # Calculate total duration for each set of trajectories
-    total_durations = [sum(len(route) for route in trajectories) if isinstance(trajectories, list) else 0 for trajectories in trajectory_list]
-
-    
-    plt.figure(figsize=(10, 6))
-    plt.scatter(total_durations, k_score_list, alpha=0.6, c='blue', edgecolors='w', s=100)
+    fig = plt.figure(figsize=(10, 6))
+    plt.scatter(durations, k_scores, alpha=0.6, c='blue', edgecolors='w', s=100)
     plt.title("Total Duration vs K-Score")
     plt.xlabel("Total Duration (in minutes)")
     plt.ylabel("K-Score")
     plt.grid(True)
-    plt.show()
+    show_or_save(fig, output_path)
 
 
-def plot_trajectory_length_vs_score(k_scores, trajectories):
+def plot_trajectory_length_vs_score(k_scores, trajectories, output_path=None):
     """
     Creates a scatter plot comparing trajectory lengths with their K-scores.
 
@@ -182,27 +284,27 @@ def plot_trajectory_length_vs_score(k_scores, trajectories):
     # Calculate the length of each trajectory
     trajectory_lengths = []
     valid_k_scores = []
-    
+
     for k_score, trajectory in zip(k_scores, trajectories):
-        if trajectory:  
+        if trajectory:
             # Tel het totaal min van stations in alle routes van deze trajectory
             total_length = sum(len(route) for route in trajectory)
             trajectory_lengths.append(total_length)
             valid_k_scores.append(k_score)
-    
-    plt.figure(figsize=(12, 8))
+
+    fig = plt.figure(figsize=(12, 8))
     plt.scatter(trajectory_lengths, valid_k_scores, alpha=0.6, c='blue', edgecolors='w', s=100)
-    
-    if trajectory_lengths:  
+
+    if trajectory_lengths:
         # Add trend line
         z = np.polyfit(trajectory_lengths, valid_k_scores, 1)
         p = np.poly1d(z)
         plt.plot(trajectory_lengths, p(trajectory_lengths), "r--", alpha=0.8, label='Trend Line')
-    
+
     plt.title("Trajectory Length vs K-Score")
     plt.xlabel("Total time of trajectory")
     plt.ylabel("K-Score")
     plt.grid(True, alpha=0.3)
     plt.legend()
-    
-    plt.show()
\ No newline at end of file
+
+    show_or_save(fig, output_path)